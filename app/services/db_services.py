@@ -3,6 +3,7 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 from pymongo.server_api import ServerApi
+from db_indexes import ensure_indexes
 
 load_dotenv()
 
@@ -13,6 +14,8 @@ db = client['supplysentinel']
 fulfillment_centers = db['fulfillment_center']  
 risk_snapshots_collection = db['risk_snapshots']
 
+ensure_indexes(db, ['fulfillment_center', 'risk_snapshots'])
+
 def fetch_all_centers():
     return list(fulfillment_centers.find())
 
@@ -0,0 +1,130 @@
+# Contingency planning used by risk_prediction_dashboard.py. Every collection is
+# passed in, so the same functions run against MongoDB or against the in-memory
+# collections loaded from a dataset snapshot by snapshots.py.
+
+import logging
+from geopy.distance import geodesic
+
+logger = logging.getLogger(__name__)
+
+# Updated Contingency Plan Logic
+def generate_contingency_plan(fc_name, city, risk_score, risk_data, fc_coordinates, current_emergency_classifications, shipments_collection, fulfillment_centers_collection, inventory_collection, fc_id_to_name):
+    full_contingency_plan = []
+    emergency_skus = [c["SKU"] for c in current_emergency_classifications if c["Emergency"]]
+    summary_status = "No re-routing needed"
+    should_evaluate_rerouting = False
+    gemini_status = risk_data.get(fc_name, {}).get("Status", "Low Risk")  # Default to Low Risk if missing
+  
+    if gemini_status == "High Risk":
+        should_evaluate_rerouting = True
+        full_contingency_plan.append({"Type": "Info", "Message": "Gemini assessed status as High Risk. Immediate re-routing evaluation triggered."})
+    elif gemini_status == "Medium Risk":
+        should_evaluate_rerouting = True
+        full_contingency_plan.append({"Type": "Info", "Message": "Gemini assessed status as Medium Risk. Re-routing evaluation for potential disruptions triggered."})
+    elif emergency_skus and any(word in risk_data.get(fc_name, {}).get("Reasoning", "")for word in ["disruption", "delay", "impact", "traffic", "issue", "risk"]):
+        should_evaluate_rerouting = True
+        full_contingency_plan.append({"Type": "Info", "Message": "Emergency SKUs detected and disruption/risk mentioned in reasoning. Re-routing evaluation triggered."})
+      
+    if not should_evaluate_rerouting:
+        full_contingency_plan.append({"Type": "Info", "Message": "No re-routing needed based on risk assessment."})
+        return summary_status, full_contingency_plan, []
+  
+    if not emergency_skus:
+        full_contingency_plan.append({"Type": "Info", "Message": "No emergency SKUs identified for re-routing consideration."})
+        return "Re-routing evaluation needed (No Emergency SKUs)", full_contingency_plan, []
+  
+    shipments_found_for_emergency_skus = False
+    re_routing_options_found = False
+    emergency_sku_reroute_status = []
+  
+    for sku in emergency_skus:
+        shipments = list(shipments_collection.find({"Product_SKU": sku, "Status": {"$in": ["Pending", "In Transit", "Out for Delivery"]}}))
+      
+        if not shipments:
+            full_contingency_plan.append({"Type": "No Shipment", "SKU": sku, "Status": f"No active shipments found for emergency SKU {sku}."})
+            emergency_sku_reroute_status.append({"SKU": sku, "Status": "No Active Shipment"})
+            continue
+        else:
+            shipments_found_for_emergency_skus = True
+          
+        for shipment in shipments:
+            shipment_id = shipment.get("Shipment_ID", "N/A")
+            required_qty = shipment.get("Order_Volume", 0)
+            dest_lat = shipment.get("Destination_Lat")
+            dest_lon = shipment.get("Destination_Lon")
+            original_cost = shipment.get("initial_shipping_cost", 0)
+            original_tat_days = shipment.get("initial_delivery_tat_days", 0)
+          
+            if dest_lat is None or dest_lon is None:
+                full_contingency_plan.append({"Type": "Shipment", "Shipment ID": shipment_id, "SKU": sku, "Status": "Missing destination coordinates."})
+                emergency_sku_reroute_status.append({"SKU": sku, "Status": "No Optimal Route"})
+                continue
+          
+            nearest_fcs_ids = get_nearest_fcs(dest_lat, dest_lon, fc_coordinates)
+            found_alternative_for_this_shipment = False
+            for nearby_fc_id in nearest_fcs_ids:
+                nearby_fc_name = fc_id_to_name.get(nearby_fc_id, nearby_fc_id)
+                nearby_fc_details_doc = fulfillment_centers_collection.find_one({"FC_ID": nearby_fc_id}) 
+              
+                if not nearby_fc_details_doc:
+                    logger.warning(f"FC details not found in DB for nearby_fc_id: {nearby_fc_id}")
+                    continue
+              
+                cost_multiplier = nearby_fc_details_doc.get("re_routing_cost_multiplier", 1.2)
+                tat_adder = nearby_fc_details_doc.get("re_routing_tat_adder_days", 1)
+                availability = check_inventory(inventory_collection, nearby_fc_id, sku, required_qty)
+                if availability >= 90:
+                    re_routed_cost = original_cost * cost_multiplier
+                    re_routed_tat_days = original_tat_days + tat_adder
+                    cost_increase = re_routed_cost - original_cost
+                    tat_delay_days = re_routed_tat_days - original_tat_days
+                  
+                    full_contingency_plan.append({
+                        "Type": "Shipment",
+                        "Shipment ID": shipment_id,
+                        "SKU": sku,
+                        "Re-routing Destination": nearby_fc_name,
+                        "Inventory %": round(availability, 1),
+                        "Original Cost": round(original_cost, 2),
+                        "New Cost": round(re_routed_cost, 2),
+                        "Cost Δ": round(cost_increase, 2),
+                        "Original TAT": original_tat_days,
+                        "New TAT": re_routed_tat_days,
+                        "TAT Δ": tat_delay_days
+                    })
+                    re_routing_options_found = True
+                    found_alternative_for_this_shipment = True
+                    emergency_sku_reroute_status.append({"SKU": sku, "Status": "Re-routed"})
+                    break
+              
+            if not found_alternative_for_this_shipment:
+                full_contingency_plan.append({"Type": "Shipment", "Shipment ID": shipment_id, "SKU": sku, "Status": "No nearby FC with sufficient inventory within 150 miles to re-route."})
+                emergency_sku_reroute_status.append({"SKU": sku, "Status": "No Optimal Route"})
+              
+    if re_routing_options_found:
+        summary_status = "Re-routing options available"
+    elif shipments_found_for_emergency_skus:
+        summary_status = "Re-routing evaluation: No optimal routes found"
+    else:
+        summary_status = "No active emergency shipments found"
+      
+    return summary_status, full_contingency_plan, emergency_sku_reroute_status
+
+# Check Inventory Availability
+def check_inventory(inventory_collection, fc_id, sku, required_qty):
+    inventory_doc = inventory_collection.find_one({"FC_ID": fc_id, "Product_SKU": sku})
+    if inventory_doc and "Quantity" in inventory_doc:
+        available_qty = inventory_doc["Quantity"]
+        return (available_qty / required_qty) * 100 if required_qty > 0 else 0.0
+    return 0.0
+
+# Function to get nearest FCs based on distance
+def get_nearest_fcs(destination_lat, destination_lon, fc_coordinates):
+    nearest_fcs = []
+    for fc_id, fc_details in fc_coordinates.items():
+        fc_lat, fc_lon = fc_details["coords"]
+        distance = geodesic((destination_lat, destination_lon), (fc_lat, fc_lon)).miles
+        if distance <= 150:
+            nearest_fcs.append((fc_id, distance))
+    nearest_fcs.sort(key=lambda x: x[1])
+    return [fc[0] for fc in nearest_fcs]
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
 import requests
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 import schedule
 import time
 import praw
@@ -9,11 +10,20 @@ import feedparser
 from fake_useragent import UserAgent
 from datetime import datetime, timedelta
 import pytz
+import numpy as np
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 import logging
 import os
+import re
+import hashlib
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from db_indexes import ensure_indexes
+from metrics import REGISTRY, start_metrics_server
+from watermarks import WatermarkTracker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -39,11 +49,73 @@ for var in required_env_vars:
         raise SystemExit(f"Exiting due to missing environment variable: {var}")
 
 # API Endpoints
-WEATHER_URL = "https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current_weather=true&hourly=temperature_2m,wind_speed_120m,wind_speed_180m,rain,showers,snowfall,snow_depth,visibility,temperature_80m,temperature_120m,temperature_180m,wind_speed_80m,wind_speed_10m,apparent_temperature&forecast_days=16"
+WEATHER_API_URL = "https://api.open-meteo.com/v1/forecast"
 NEWS_API_URL = "https://newsapi.org/v2/everything"
+REUTERS_BUSINESS_RSS = "http://feeds.reuters.com/reuters/businessNews"
 FREIGHTWAVES_RSS = "https://www.freightwaves.com/feed"
 SUPPLYCHAIN247_RSS = "https://www.supplychain247.com/feed"
 
+# Open-Meteo request profiles: each consumer declares only the fields it reads
+FORECAST_HOURLY_FIELDS = ["rain", "showers", "snowfall", "wind_speed_10m", "wind_speed_80m", "visibility"]
+WEATHER_PROFILES = {
+    "current": {"current_weather": "true"},
+    "forecast": {
+        "hourly": ",".join(FORECAST_HOURLY_FIELDS),
+        "forecast_days": "16",
+        "timeformat": "unixtime",
+        "wind_speed_unit": "ms"
+    }
+}
+WEATHER_PROFILE_SOURCES = {"current": "weather", "forecast": "weather_forecast"}
+
+# Horizons (hours) for the precomputed "peak forecast risk" per location
+FORECAST_RISK_HORIZONS = [6, 24, 72, 168]
+
+# Locations per Open-Meteo request (comma-separated coordinates) and the
+# concurrency cap for those batch requests
+WEATHER_BATCH_SIZE = int(os.environ.get("WEATHER_BATCH_SIZE", 50))
+WEATHER_MAX_WORKERS = int(os.environ.get("WEATHER_MAX_WORKERS", 8))
+
+# Maximum number of upserts sent in a single bulk_write call
+BULK_WRITE_BATCH_SIZE = int(os.environ.get("BULK_WRITE_BATCH_SIZE", 500))
+
+# Near-duplicate story collapsing: maximum SimHash Hamming distance (of 64 bits)
+# for two news/labor/logistics stories to be treated as the same story
+STORY_MAX_DISTANCE = int(os.environ.get("STORY_MAX_DISTANCE", 7))
+
+# Reddit search planning: general subreddits are searched once per cycle and
+# posts are attributed to cities locally; city subreddits are searched in parallel
+REDDIT_GENERAL_SUBREDDITS = ["supplychain", "logistics", "news"]
+REDDIT_MAX_QUERY_LENGTH = 512
+REDDIT_SEARCH_LIMIT = int(os.environ.get("REDDIT_SEARCH_LIMIT", 100))
+REDDIT_MAX_WORKERS = int(os.environ.get("REDDIT_MAX_WORKERS", 4))
+
+# Staged ingestion pipelines: bound on items waiting between stages, normalize
+# workers per source, and concurrent NewsAPI requests
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 1000))
+PIPELINE_NORMALIZE_WORKERS = int(os.environ.get("PIPELINE_NORMALIZE_WORKERS", 2))
+NEWS_MAX_WORKERS = int(os.environ.get("NEWS_MAX_WORKERS", 4))
+
+# Worker pool size for scheduled ingestion jobs (defaults to one per source)
+# and how often in-flight jobs are checked against their timeout
+INGEST_MAX_WORKERS = int(os.environ.get("INGEST_MAX_WORKERS", 0)) or None
+OVERRUN_CHECK_SECONDS = 10
+
+# Prometheus text metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 disables)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9108))
+
+# Level for per-document log lines (DEBUG by default; set INFO to see them)
+DOCUMENT_LOG_LEVEL = getattr(logging, os.environ.get("DOCUMENT_LOG_LEVEL", "DEBUG").upper(), logging.DEBUG)
+
+# Ingestion metrics, labelled by source (collection) and phase (http, parse, score, write)
+INGEST_PHASE_SECONDS = REGISTRY.histogram("ingest_phase_seconds", "Latency of one ingestion phase call", ["source", "phase"])
+INGEST_HTTP_REQUESTS = REGISTRY.counter("ingest_http_requests_total", "HTTP requests made by ingestion sources", ["source", "status"])
+INGEST_DOCUMENTS = REGISTRY.counter("ingest_documents_total", "Documents queued and written by ingestion sources", ["source", "result"])
+INGEST_RUNS = REGISTRY.counter("ingest_runs_total", "Scheduled ingestion runs by outcome", ["source", "result"])
+INGEST_RUN_SECONDS = REGISTRY.histogram("ingest_run_seconds", "Duration of a full scheduled ingestion run", ["source"])
+INGEST_PIPELINE_ITEMS = REGISTRY.counter("ingest_pipeline_items_total", "Items leaving each ingestion pipeline stage", ["source", "stage"])
+
 # MongoDB Setup
 try:
     client = MongoClient(
@@ -66,16 +138,16 @@ news_collection = db["news"]
 social_media_collection = db["social_media"]
 labor_collection = db["labor"]
 logistics_collection = db["logistics"]
+feed_state_collection = db["feed_state"]
+weather_forecast_collection = db["weather_forecast"]
+ingest_runs_collection = db["ingest_runs"]
+watermarks_collection = db["ingest_watermarks"]
 
-# Set TTL indexes for all collections (24 hours = 86,400 seconds) on timestamp field
-collections = [weather_collection, news_collection, social_media_collection, labor_collection, logistics_collection]
-for collection in collections:
-    try:
-        collection.drop_indexes()
-        collection.create_index("timestamp", expireAfterSeconds=86400)
-        logger.info(f"TTL index ensured for {collection.name} on timestamp field.")
-    except Exception as e:
-        logger.warning(f"Could not drop/create TTL index on {collection.name}: {e}")
+# Reconcile indexes (TTL on timestamp plus the query/upsert shapes) with the shared catalog
+ensure_indexes(db, [
+    "weather", "weather_forecast", "news", "social_media", "labor", "logistics",
+    "feed_state", "ingest_runs", "ingest_watermarks"
+])
 
 # User Agent for RSS scraping
 ua = UserAgent()
@@ -107,6 +179,52 @@ keywords = [
     "delivery", "shipping", "transport", "warehouse", "distribution"
 ]
 
+# Keywords for labor news in the Reuters business feed
+labor_keywords = ["strike", "labor", "worker", "union", "contract", "wage", "hiring", "unemployment"]
+
+# Precompiled multi-pattern matcher: all terms are folded into one regex trie so
+# each text is scanned once, however many cities and keywords there are. Terms
+# must start and end on a word boundary (a trailing plural "s" is allowed, so
+# "port" matches "ports" but not "Portland"); overlapping terms resolve to the
+# longest match.
+class TermMatcher:
+    def __init__(self, terms_by_kind):
+        self.kinds = {}
+        trie = {}
+        for kind, terms in terms_by_kind.items():
+            for term in terms:
+                folded = term.lower()
+                self.kinds.setdefault(folded, (kind, term))
+                node = trie
+                for char in folded:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+        self.regex = re.compile(r"\b(" + self._trie_pattern(trie) + r")s?\b", re.IGNORECASE)
+
+    def _trie_pattern(self, node):
+        alternatives = [re.escape(char) + self._trie_pattern(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ""
+        pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    # Every match in text as (kind, term, position)
+    def scan(self, text):
+        return [(*self.kinds[m.group(1).lower()], m.start()) for m in self.regex.finditer(text)]
+
+    # Distinct matched terms grouped by kind, in order of first appearance
+    def match(self, text):
+        grouped = {kind: [] for kind, _ in self.kinds.values()}
+        for kind, term, _ in self.scan(text):
+            if term not in grouped[kind]:
+                grouped[kind].append(term)
+        return grouped
+
+city_keyword_matcher = TermMatcher({"city": [city for city, _, _, _ in locations], "keyword": keywords})
+city_labor_matcher = TermMatcher({"city": [city for city, _, _, _ in locations], "keyword": labor_keywords})
+
 # Reddit API Setup
 reddit = praw.Reddit(
     client_id=REDDIT_CLIENT_ID,
@@ -117,331 +235,913 @@ reddit = praw.Reddit(
 # Setup requests session with retry logic
 session = requests.Session()
 retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-session.mount("https://", HTTPAdapter(max_retries=retries))
+adapter = HTTPAdapter(max_retries=retries, pool_maxsize=max(10, WEATHER_MAX_WORKERS))
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
+# session.get with per-source HTTP latency and status metrics
+def timed_get(source, url, **kwargs):
+    with INGEST_PHASE_SECONDS.time(source=source, phase="http"):
+        try:
+            response = session.get(url, **kwargs)
+        except requests.exceptions.RequestException:
+            INGEST_HTTP_REQUESTS.inc(source=source, status="error")
+            raise
+    INGEST_HTTP_REQUESTS.inc(source=source, status=response.status_code)
+    return response
 
 # Helper function to get current time in EST as datetime object
 def get_est_datetime():
     est = pytz.timezone("America/New_York")
     return datetime.now(est)
 
-# Fetch Weather Data (Open-Meteo)
+# Batched upsert writer: buffers normalized docs per source and flushes them
+# with unordered bulk_write calls instead of one round trip per document
+class BulkUpsertWriter:
+    def __init__(self, collection, source, batch_size=None):
+        self.collection = collection
+        self.source = source
+        self.batch_size = batch_size or BULK_WRITE_BATCH_SIZE
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.upserted = 0
+        self.matched = 0
+        self.modified = 0
+        self.errors = 0
+
+    def add(self, filter_doc, doc):
+        # Docs with the same filter in one batch collapse to the latest version
+        key = tuple(sorted((k, str(v)) for k, v in filter_doc.items()))
+        logger.log(DOCUMENT_LOG_LEVEL, f"Queued {self.source} document for {self.collection.name}: {filter_doc}")
+        INGEST_DOCUMENTS.inc(source=self.collection.name, result="queued")
+        with self.lock:
+            self.pending[key] = UpdateOne(filter_doc, {"$set": doc}, upsert=True)
+            if len(self.pending) < self.batch_size:
+                return
+            operations = list(self.pending.values())
+            self.pending = {}
+        self._write(operations)
+
+    def flush(self):
+        with self.lock:
+            operations = list(self.pending.values())
+            self.pending = {}
+        if operations:
+            self._write(operations)
+        return self.upserted + self.modified
+
+    def _write(self, operations):
+        errors = 0
+        try:
+            with INGEST_PHASE_SECONDS.time(source=self.collection.name, phase="write"):
+                result = self.collection.bulk_write(operations, ordered=False)
+            upserted, matched, modified = result.upserted_count, result.matched_count, result.modified_count
+        except BulkWriteError as e:
+            details = e.details
+            upserted, matched, modified = details.get("nUpserted", 0), details.get("nMatched", 0), details.get("nModified", 0)
+            errors = len(details.get("writeErrors", []))
+            with self.lock:
+                self.errors += errors
+            logger.error(f"Bulk write to {self.collection.name} for {self.source} had {len(details.get('writeErrors', []))} errors: {details.get('writeErrors', [])[:3]}")
+        with self.lock:
+            self.upserted += upserted
+            self.matched += matched
+            self.modified += modified
+        for result_name, value in (("upserted", upserted), ("matched", matched), ("modified", modified), ("errors", errors)):
+            INGEST_DOCUMENTS.inc(value, source=self.collection.name, result=result_name)
+        logger.info(f"Bulk write to {self.collection.name} for {self.source}: ops={len(operations)}, upserted={upserted}, matched={matched}, modified={modified}")
+
+# Parse a NewsAPI publishedAt timestamp (e.g. 2024-05-01T12:34:56Z) to epoch seconds
+def parse_published_at(published_at):
+    try:
+        return datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=pytz.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+# Near-duplicate story index over the 24h TTL window. Each story gets a 64-bit
+# SimHash of its normalized title + description; the fingerprint is split into
+# bands so that any two within STORY_MAX_DISTANCE bits share at least one band
+# exactly, which makes lookups a few dict probes instead of a scan.
+class StoryIndex:
+    def __init__(self, max_distance=None, window=86400):
+        self.max_distance = STORY_MAX_DISTANCE if max_distance is None else max_distance
+        self.band_count = self.max_distance + 1
+        self.band_bits = 64 // self.band_count
+        self.window = window
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.bands = [{} for _ in range(self.band_count)]
+        self.next_id = 0
+        self.collapsed = 0
+
+    @staticmethod
+    def fingerprint(text):
+        normalized = re.sub(r"<[^>]+>", " ", text or "").lower()
+        words = re.findall(r"[a-z0-9]+", normalized)
+        if len(words) < 3:
+            return None
+        tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        hashes = np.array([int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") for token in tokens], dtype=np.uint64)
+        bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+        votes = bits.sum(axis=0) * 2 > len(tokens)
+        return int(np.dot(votes.astype(np.uint64), np.uint64(1) << np.arange(64, dtype=np.uint64)))
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.band_count)]
+
+    def _find(self, fingerprint):
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            for entry_id in self.bands[band].get(key, ()):
+                entry = self.entries[entry_id]
+                if bin(entry["fingerprint"] ^ fingerprint).count("1") <= self.max_distance:
+                    return entry
+        return None
+
+    def _register(self, fingerprint, collection_name, filter_doc, batch=None, doc=None, added=None):
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = {
+            "id": entry_id, "fingerprint": fingerprint, "collection": collection_name, "filter": filter_doc,
+            "batch": batch, "doc": doc, "flushed": batch is None, "added": added or time.time()
+        }
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            self.bands[band].setdefault(key, set()).add(entry_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.window
+        for entry_id in [entry_id for entry_id, entry in self.entries.items() if entry["added"] < cutoff]:
+            entry = self.entries.pop(entry_id)
+            for band, key in enumerate(self._band_keys(entry["fingerprint"])):
+                self.bands[band].get(key, set()).discard(entry_id)
+
+    # Load fingerprints already stored within the window so restarts keep collapsing
+    def warm(self, collections_by_name):
+        cutoff = time.time() - self.window
+        with self.lock:
+            for collection_name, collection in collections_by_name.items():
+                try:
+                    for doc in collection.find({"timestamp": {"$gte": cutoff}, "fingerprint": {"$exists": True}}, {"fingerprint": 1, "title": 1, "location": 1, "est_datetime": 1, "timestamp": 1}):
+                        filter_doc = {"title": doc.get("title"), "location": doc.get("location"), "est_datetime": doc.get("est_datetime")}
+                        self._register(int(doc["fingerprint"], 16), collection_name, filter_doc, added=doc.get("timestamp"))
+                except Exception as e:
+                    logger.warning(f"Could not warm story index from {collection_name}: {e}")
+
+    # Collapse a batch of (filter, doc) stories. Duplicates within the batch are
+    # merged into the first copy in memory; duplicates of already-written stories
+    # become $addToSet merges on the canonical document. Returns the stories that
+    # still need writing, the merges, and a batch token for mark_flushed().
+    def collapse(self, collection_name, stories):
+        batch = object()
+        keep, merges = [], []
+        with self.lock:
+            self._prune()
+            for filter_doc, doc in stories:
+                fingerprint = self.fingerprint(f"{doc.get('title')} {doc.get('description')}")
+                if fingerprint is None:
+                    keep.append((filter_doc, doc))
+                    continue
+                doc["fingerprint"] = format(fingerprint, "016x")
+                entry = self._find(fingerprint)
+                if entry is not None and entry["batch"] is batch:
+                    for field in ("sources", "locations"):
+                        entry["doc"][field] += [value for value in doc[field] if value not in entry["doc"][field]]
+                elif entry is not None and entry["flushed"]:
+                    merges.append((entry["collection"], entry["filter"], doc["sources"], doc["locations"]))
+                else:
+                    self._register(fingerprint, collection_name, filter_doc, batch, doc)
+                    keep.append((filter_doc, doc))
+                    continue
+                self.collapsed += 1
+        return keep, merges, batch
+
+    def mark_flushed(self, batch):
+        with self.lock:
+            for entry in self.entries.values():
+                if entry["batch"] is batch:
+                    entry["flushed"] = True
+                    entry["doc"] = None
+
+# Collapse near-duplicates, write the remaining stories through writer and
+# apply merges to canonical documents; returns the number of stories written
+def write_collapsed_stories(writer, stories):
+    keep, merges, batch = story_index.collapse(writer.collection.name, stories)
+    for filter_doc, doc in keep:
+        writer.add(filter_doc, doc)
+    writer.flush()
+    if not writer.errors:
+        story_index.mark_flushed(batch)
+
+    merges_by_collection = {}
+    for collection_name, filter_doc, sources, story_locations in merges:
+        merges_by_collection.setdefault(collection_name, []).append(
+            UpdateOne(filter_doc, {"$addToSet": {"sources": {"$each": sources}, "locations": {"$each": story_locations}}})
+        )
+    for collection_name, operations in merges_by_collection.items():
+        try:
+            db[collection_name].bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error merging duplicate stories into {collection_name}: {str(e)}")
+    if len(stories) != len(keep):
+        logger.info(f"Collapsed {len(stories) - len(keep)} duplicate stories for {writer.source} ({len(merges)} merged into existing documents)")
+    return len(keep)
+
+story_index = StoryIndex()
+story_index.warm({"news": news_collection, "labor": labor_collection, "logistics": logistics_collection})
+
+# Pipeline sink for news, labor and logistics: buffers stories and collapses
+# near-duplicates one writer batch at a time
+class StorySink:
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = []
+        self.written = 0
+
+    def add(self, filter_doc, doc):
+        self.pending.append((filter_doc, doc))
+        if len(self.pending) >= self.writer.batch_size:
+            self.flush()
+
+    def flush(self):
+        stories, self.pending = self.pending, []
+        if stories:
+            self.written += write_collapsed_stories(self.writer, stories)
+        return self.written
+
+STAGE_DONE = object()
+
+# Staged ingestion pipeline. Fetch workers run fetch(task), a generator of raw
+# items; normalize workers turn each raw item into (filter, doc) pairs; a single
+# sink thread hands those to sink.add() (a BulkUpsertWriter or StorySink), which
+# writes in batches. Stages are joined by bounded queues, so a slow stage blocks
+# the one before it and memory stays bounded however large a response is, while
+# fetching, normalizing and writing overlap.
+class IngestPipeline:
+    def __init__(self, name, fetch, normalize, sink, fetch_workers=1, normalize_workers=None, queue_size=None):
+        self.name = name
+        self.fetch = fetch
+        self.normalize = normalize
+        self.sink = sink
+        self.fetch_workers = max(1, fetch_workers)
+        self.normalize_workers = max(1, normalize_workers or PIPELINE_NORMALIZE_WORKERS)
+        self.queue_size = max(1, queue_size or PIPELINE_QUEUE_SIZE)
+        self.lock = threading.Lock()
+        self.stats = {"fetched": 0, "normalized": 0, "errors": 0}
+
+    def _count(self, key, stage=None):
+        with self.lock:
+            self.stats[key] += 1
+        if stage:
+            INGEST_PIPELINE_ITEMS.inc(source=self.name, stage=stage)
+
+    def _fetch_stage(self, tasks, raw_queue):
+        while True:
+            try:
+                task = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                for item in self.fetch(task):
+                    raw_queue.put(item)
+                    self._count("fetched", "fetch")
+            except Exception as e:
+                self._count("errors")
+                logger.error(f"Error fetching {self.name}: {str(e)}")
+
+    def _normalize_stage(self, raw_queue, doc_queue):
+        while True:
+            item = raw_queue.get()
+            if item is STAGE_DONE:
+                return
+            try:
+                for filter_doc, doc in self.normalize(item):
+                    doc_queue.put((filter_doc, doc))
+            except Exception as e:
+                self._count("errors")
+                logger.error(f"Error processing {self.name} item: {str(e)}")
+
+    def _sink_stage(self, doc_queue):
+        while True:
+            entry = doc_queue.get()
+            if entry is STAGE_DONE:
+                return
+            try:
+                self.sink.add(*entry)
+                self._count("normalized", "sink")
+            except Exception as e:
+                self._count("errors")
+                logger.error(f"Error writing {self.name} documents: {str(e)}")
+
+    # Run every task through the pipeline, flush the sink and return the stats
+    def run(self, tasks):
+        task_queue = queue.Queue()
+        for task in tasks:
+            task_queue.put(task)
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        doc_queue = queue.Queue(maxsize=self.queue_size)
+
+        fetchers = [
+            threading.Thread(target=self._fetch_stage, args=(task_queue, raw_queue), name=f"{self.name}-fetch-{i}", daemon=True)
+            for i in range(max(1, min(self.fetch_workers, len(tasks))))
+        ]
+        normalizers = [
+            threading.Thread(target=self._normalize_stage, args=(raw_queue, doc_queue), name=f"{self.name}-normalize-{i}", daemon=True)
+            for i in range(self.normalize_workers)
+        ]
+        sink = threading.Thread(target=self._sink_stage, args=(doc_queue,), name=f"{self.name}-sink", daemon=True)
+        for thread in fetchers + normalizers + [sink]:
+            thread.start()
+
+        for thread in fetchers:
+            thread.join()
+        for _ in normalizers:
+            raw_queue.put(STAGE_DONE)
+        for thread in normalizers:
+            thread.join()
+        doc_queue.put(STAGE_DONE)
+        sink.join()
+        try:
+            self.sink.flush()
+        except Exception as e:
+            self._count("errors")
+            logger.error(f"Error writing {self.name} documents: {str(e)}")
+        return self.stats
+
+# Build Open-Meteo query params for a batch of locations, asking only for the
+# fields declared by the profile
+def build_weather_params(batch, profile="current"):
+    params = dict(WEATHER_PROFILES[profile])
+    params["latitude"] = ",".join(str(lat) for _, lat, _, _ in batch)
+    params["longitude"] = ",".join(str(lon) for _, _, lon, _ in batch)
+    return params
+
+# Fetch Weather Data for a batch of locations in one Open-Meteo request
+def fetch_weather_batch(batch, profile="current"):
+    source = WEATHER_PROFILE_SOURCES[profile]
+    response = timed_get(source, WEATHER_API_URL, params=build_weather_params(batch, profile), timeout=10)
+    response.raise_for_status()
+    with INGEST_PHASE_SECONDS.time(source=source, phase="parse"):
+        data = response.json()
+    # Open-Meteo returns a list for multiple coordinates and a single object otherwise
+    results = data if isinstance(data, list) else [data]
+    if len(results) != len(batch):
+        raise ValueError(f"Open-Meteo returned {len(results)} results for {len(batch)} locations")
+    return list(zip(batch, results))
+
+# Fetch a batch, falling back to one request per location if the batch fails
+# so a single bad location cannot take the rest of its batch down with it
+def fetch_weather_batch_isolated(batch, profile="current"):
+    try:
+        return fetch_weather_batch(batch, profile), []
+    except Exception as e:
+        if len(batch) == 1:
+            return [], [(batch[0][0], e)]
+        logger.warning(f"Weather batch of {len(batch)} locations failed ({e}), retrying per location")
+    results, failures = [], []
+    for location in batch:
+        try:
+            results.extend(fetch_weather_batch([location], profile))
+        except Exception as e:
+            failures.append((location[0], e))
+    return results, failures
+
+# Fetch Weather Data (Open-Meteo) for all locations: concurrent batch requests
+# stream their results through the pipeline into the bulk writer
 def fetch_weather():
-    count = 0
     est_time = get_est_datetime()
     current_timestamp = time.time()
-    for city, lat, lon, _ in locations:
-        try:
-            url = WEATHER_URL.format(latitude=lat, longitude=lon)
-            response = session.get(url, timeout=5)
-            response.raise_for_status()
-            data = response.json()
-            weather_doc = {
-                "location": city,
-                "lat": lat,
-                "lon": lon,
-                "weather": data.get("current_weather", {}).get("weathercode", None),
-                "temp": data.get("current_weather", {}).get("temperature", None),
-                "windspeed": data.get("current_weather", {}).get("windspeed", None),
-                "est_datetime": est_time,
-                "timestamp": current_timestamp
-            }
-            existing_docs = weather_collection.count_documents({"location": city})
-            logger.info(f"Documents for {city} before update: {existing_docs}")
-            result = weather_collection.update_one(
-                {"location": city, "est_datetime": est_time},
-                {"$set": weather_doc},
-                upsert=True
-            )
-            logger.info(f"Update result for {city}: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-            inserted_doc = weather_collection.find_one({"location": city, "est_datetime": est_time})
-            if inserted_doc:
-                logger.info(f"Verified: Document found for {city} at {est_time}")
-            else:
-                logger.error(f"Failed to find document for {city} at {est_time}")
-            logger.info(f"Documents for {city} after update: {weather_collection.count_documents({'location': city})}")
-            count += 1
-        except requests.exceptions.RequestException as e:
+    writer = BulkUpsertWriter(weather_collection, "weather")
+    batch_size = max(1, WEATHER_BATCH_SIZE)
+    batches = [locations[i:i + batch_size] for i in range(0, len(locations), batch_size)]
+
+    def fetch(batch):
+        results, failures = fetch_weather_batch_isolated(batch)
+        for city, e in failures:
             logger.error(f"Error fetching weather for {city}: {str(e)}")
-    logger.info(f"Total weather documents stored: {count}")
+        yield from results
+
+    def normalize(result):
+        (city, lat, lon, _), data = result
+        current_weather = data.get("current_weather", {})
+        weather_doc = {
+            "location": city,
+            "lat": lat,
+            "lon": lon,
+            "weather": current_weather.get("weathercode", None),
+            "temp": current_weather.get("temperature", None),
+            "windspeed": current_weather.get("windspeed", None),
+            "est_datetime": est_time,
+            "timestamp": current_timestamp
+        }
+        yield {"location": city, "est_datetime": est_time}, weather_doc
+
+    stats = IngestPipeline("weather", fetch, normalize, writer, fetch_workers=WEATHER_MAX_WORKERS).run(batches)
+    logger.info(f"Total weather documents stored: {stats['normalized']} in {len(batches)} requests (upserted={writer.upserted}, modified={writer.modified})")
+
+# Vectorized hourly weather risk for a (locations x hours) block, using the same
+# thresholds as calculate_weather_risk: rain > 0.5mm, wind > 10 m/s,
+# visibility < 1km, plus snowfall in place of the storm condition
+def score_forecast_risk(hourly):
+    precipitation = np.nan_to_num(hourly["rain"]) + np.nan_to_num(hourly["showers"])
+    wind_speed = np.nan_to_num(np.fmax(hourly["wind_speed_10m"], hourly["wind_speed_80m"]))
+    visibility = np.nan_to_num(hourly["visibility"], nan=10000.0)
+    snowfall = np.nan_to_num(hourly["snowfall"])
+    risk = np.where(precipitation > 0.5, 0.4, 0.0)
+    risk += np.where(wind_speed > 10, 0.3, 0.0)
+    risk += np.where(visibility < 1000, 0.2, 0.0)
+    risk += np.where(snowfall > 0, 0.1, 0.0)
+    return np.round(np.minimum(risk, 1.0), 2)
+
+# Peak risk and the hour it occurs for each location over each horizon, counted from the current hour
+def peak_forecast_risk(times, risk, now, horizons=None):
+    peaks = {}
+    for hours in horizons or FORECAST_RISK_HORIZONS:
+        window = np.flatnonzero((times > now - 3600) & (times <= now + hours * 3600))
+        if window.size == 0:
+            peaks[str(hours)] = (np.zeros(risk.shape[0]), np.full(risk.shape[0], np.nan))
+            continue
+        peak_index = window[np.argmax(risk[:, window], axis=1)]
+        peaks[str(hours)] = (risk[np.arange(risk.shape[0]), peak_index], times[peak_index])
+    return peaks
+
+# Fetch the hourly Open-Meteo forecast for all locations, score every location x
+# hour in one pass and store one columnar forecast document per location
+def fetch_weather_forecast():
+    est_time = get_est_datetime()
+    current_timestamp = time.time()
+    batch_size = max(1, WEATHER_BATCH_SIZE)
+    batches = [locations[i:i + batch_size] for i in range(0, len(locations), batch_size)]
+    results = []
+    max_workers = max(1, min(WEATHER_MAX_WORKERS, len(batches)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="forecast") as executor:
+        futures = [executor.submit(fetch_weather_batch_isolated, batch, "forecast") for batch in batches]
+        for future in as_completed(futures):
+            batch_results, failures = future.result()
+            for city, e in failures:
+                logger.error(f"Error fetching weather forecast for {city}: {str(e)}")
+            results.extend(r for r in batch_results if r[1].get("hourly", {}).get("time"))
+    if not results:
+        logger.info("No weather forecasts fetched.")
+        return
 
-# Fetch News Data (NewsAPI)
+    # Align every location on one time axis so the scorer runs on 2-D arrays
+    with INGEST_PHASE_SECONDS.time(source="weather_forecast", phase="score"):
+        times = np.array(sorted({t for _, data in results for t in data["hourly"]["time"]}), dtype=np.float64)
+        hourly = {field: np.full((len(results), times.size), np.nan) for field in FORECAST_HOURLY_FIELDS}
+        for row, (_, data) in enumerate(results):
+            columns = np.searchsorted(times, np.asarray(data["hourly"]["time"], dtype=np.float64))
+            for field in FORECAST_HOURLY_FIELDS:
+                values = data["hourly"].get(field)
+                if values is not None:
+                    hourly[field][row, columns] = np.array(values, dtype=np.float64)
+        risk = score_forecast_risk(hourly)
+        peaks = peak_forecast_risk(times, risk, current_timestamp)
+
+    writer = BulkUpsertWriter(weather_forecast_collection, "weather_forecast")
+    for row, ((city, lat, lon, _), _) in enumerate(results):
+        forecast_doc = {
+            "location": city,
+            "lat": lat,
+            "lon": lon,
+            "time": times.astype(np.int64).tolist(),
+            "hourly": {field: [None if np.isnan(v) else float(v) for v in hourly[field][row]] for field in FORECAST_HOURLY_FIELDS},
+            "hourly_risk": risk[row].tolist(),
+            "peak_risk": {hours: float(values[row]) for hours, (values, _) in peaks.items()},
+            "peak_risk_time": {hours: None if np.isnan(at[row]) else int(at[row]) for hours, (_, at) in peaks.items()},
+            "est_datetime": est_time,
+            "timestamp": current_timestamp
+        }
+        writer.add({"location": city}, forecast_doc)
+    try:
+        writer.flush()
+    except Exception as e:
+        logger.error(f"Error writing weather forecast documents: {str(e)}")
+    logger.info(f"Total weather forecast documents stored: {len(results)} x {times.size} hours (upserted={writer.upserted}, modified={writer.modified})")
+
+# Fetch News Data (NewsAPI): one request per city, up to NEWS_MAX_WORKERS at a time
 def fetch_news():
-    count = 0
     est_time = get_est_datetime()
     current_timestamp = time.time()
     yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    writer = BulkUpsertWriter(news_collection, "news")
+    sink = StorySink(writer)
+    watermarks = WatermarkTracker("news", watermarks_collection, BulkUpsertWriter)
 
-    for city, _, _, _ in locations:
+    # Yields only articles newer than the city's watermark, at most 10 per city
+    def fetch(location):
+        city = location[0]
+        query = f"{city} AND (supply chain OR weather OR disruption OR logistics)"
+        watermark = watermarks.get(city, query)
+        params = {
+            "q": query,
+            "language": "en",
+            "from": datetime.fromtimestamp(max(watermark, current_timestamp - 86400), pytz.utc).strftime("%Y-%m-%dT%H:%M:%S") if watermark else yesterday,
+            "sortBy": "publishedAt",
+            "apiKey": NEWS_API_KEY
+        }
         try:
-            query = f"{city} AND (supply chain OR weather OR disruption OR logistics)"
-            params = {
-                "q": query,
-                "language": "en",
-                "from": yesterday,
-                "sortBy": "publishedAt",
-                "apiKey": NEWS_API_KEY
-            }
-            response = session.get(NEWS_API_URL, params=params)
+            response = timed_get("news", NEWS_API_URL, params=params)
             response.raise_for_status()
-            articles = response.json().get("articles", [])
-
-            for article in articles[:10]:
-                news_doc = {
-                    "location": city,
-                    "source": "news",
-                    "title": article.get("title", "N/A"),
-                    "description": article.get("description", "N/A"),
-                    "est_datetime": est_time,
-                    "url": article.get("url", None),
-                    "timestamp": current_timestamp
-                }
-                existing_docs = news_collection.count_documents({"location": city})
-                logger.info(f"Documents for {city} before update: {existing_docs}")
-                result = news_collection.update_one(
-                    {"title": article.get("title"), "location": city, "est_datetime": est_time},
-                    {"$set": news_doc},
-                    upsert=True
-                )
-                logger.info(f"Update result for {city}: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-                inserted_doc = news_collection.find_one({"title": article.get("title"), "location": city, "est_datetime": est_time})
-                if inserted_doc:
-                    logger.info(f"Verified: News document found for {city}: {article.get('title')[:50]}...")
-                else:
-                    logger.error(f"Failed to find news document for {city}: {article.get('title')[:50]}...")
-                logger.info(f"Documents for {city} after update: {news_collection.count_documents({'location': city})}")
-                count += 1
+            with INGEST_PHASE_SECONDS.time(source="news", phase="parse"):
+                articles = response.json().get("articles", [])
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching news for {city}: {str(e)}")
-    logger.info(f"Total news documents stored: {count}")
+            return
 
-# Fetch Social Media Data (Reddit)
-def fetch_social_media():
-    count = 0
-    est_time = get_est_datetime()
-    current_timestamp = time.time()
-    general_subreddits = ["supplychain", "logistics", "news"]
-    
-    try:
-        reddit_instance = praw.Reddit(
+        new_articles = 0
+        for article in articles:
+            published = parse_published_at(article.get("publishedAt"))
+            article_id = article.get("url") or article.get("title")
+            if not watermarks.is_new(city, query, published, article_id):
+                continue
+            watermarks.observe(city, query, published, article_id)
+            yield city, published, article
+            new_articles += 1
+            if new_articles >= 10:
+                break
+
+    def normalize(item):
+        city, published, article = item
+        news_doc = {
+            "location": city,
+            "locations": [city],
+            "source": "news",
+            "sources": ["newsapi"],
+            "title": article.get("title", "N/A"),
+            "description": article.get("description", "N/A"),
+            "est_datetime": est_time,
+            "url": article.get("url", None),
+            "published_at": published,
+            "timestamp": current_timestamp
+        }
+        yield {"title": article.get("title"), "location": city, "est_datetime": est_time}, news_doc
+
+    stats = IngestPipeline("news", fetch, normalize, sink, fetch_workers=NEWS_MAX_WORKERS).run(locations)
+    if not writer.errors and not stats["errors"]:
+        watermarks.save()
+    logger.info(f"Total news documents stored: {sink.written} (upserted={writer.upserted}, modified={writer.modified})")
+
+# Split terms into as few OR-combined Reddit queries as fit within the query length limit
+def build_or_queries(terms, max_length=REDDIT_MAX_QUERY_LENGTH):
+    queries = []
+    current = []
+    for term in terms:
+        quoted = f'"{term}"' if " " in term else term
+        candidate = " OR ".join(current + [quoted])
+        if current and len(candidate) > max_length:
+            queries.append(" OR ".join(current))
+            current = [quoted]
+        else:
+            current.append(quoted)
+    if current:
+        queries.append(" OR ".join(current))
+    return queries
+
+# Plan the Reddit searches for one cycle: one city-name OR query per general
+# subreddit (cities attributed locally) and one keyword OR query per city subreddit
+def plan_reddit_searches():
+    city_names = [city for city, _, _, _ in locations]
+    plan = []
+    for subreddit_name in REDDIT_GENERAL_SUBREDDITS:
+        for query_text in build_or_queries(city_names):
+            plan.append((subreddit_name, query_text, None))
+    for city_name, _, _, city_subreddit_name in locations:
+        if city_subreddit_name and city_subreddit_name not in REDDIT_GENERAL_SUBREDDITS:
+            for query_text in build_or_queries(keywords):
+                plan.append((city_subreddit_name, query_text, city_name))
+    return plan
+
+# PRAW is not thread safe, so each worker thread gets its own Reddit instance
+reddit_thread_local = threading.local()
+
+def get_thread_reddit():
+    if not hasattr(reddit_thread_local, "reddit"):
+        reddit_thread_local.reddit = praw.Reddit(
             client_id=REDDIT_CLIENT_ID,
             client_secret=REDDIT_CLIENT_SECRET,
             user_agent=REDDIT_USER_AGENT
         )
+    return reddit_thread_local.reddit
+
+# Search newest-first and stop paging once results reach the watermark; if the
+# watermark is under an hour old only the last hour is searched
+def run_reddit_search(subreddit_name, query_text, watermark=None):
+    reddit_instance = get_thread_reddit()
+    time_filter = "hour" if watermark and time.time() - watermark < 3600 else "day"
+    submissions = []
+    with INGEST_PHASE_SECONDS.time(source="social_media", phase="http"):
+        try:
+            for submission in reddit_instance.subreddit(subreddit_name).search(query_text, sort="new", limit=REDDIT_SEARCH_LIMIT, time_filter=time_filter):
+                if watermark and submission.created_utc < watermark:
+                    break
+                submissions.append(submission)
+        except Exception:
+            INGEST_HTTP_REQUESTS.inc(source="social_media", status="error")
+            raise
+    INGEST_HTTP_REQUESTS.inc(source="social_media", status="ok")
+    return submissions
+
+# Fetch Social Media Data (Reddit): planned searches run on REDDIT_MAX_WORKERS
+# fetch workers and posts are attributed to cities by the normalize workers
+def fetch_social_media():
+    est_time = get_est_datetime()
+    current_timestamp = time.time()
+    writer = BulkUpsertWriter(social_media_collection, "social_media_reddit")
+    watermarks = WatermarkTracker("social_media_reddit", watermarks_collection, BulkUpsertWriter)
+    plan = plan_reddit_searches()
+    logger.info(f"Reddit search plan: {len(plan)} queries for {len(locations)} locations")
+
+    # Yields only posts from the last day that are newer than the query's watermark
+    def fetch(search):
+        subreddit_name, query_text, city_name = search
+        watermark_key = (city_name or "all", f"r/{subreddit_name}: {query_text}")
+        try:
+            for submission in run_reddit_search(subreddit_name, query_text, watermarks.get(*watermark_key)):
+                if (time.time() - submission.created_utc) > 86400:
+                    continue
+                if not watermarks.is_new(*watermark_key, submission.created_utc, submission.id):
+                    continue
+                watermarks.observe(*watermark_key, submission.created_utc, submission.id)
+                yield city_name, submission
+        except praw.exceptions.PRAWException as e:
+            logger.error(f"PRAW Error fetching Reddit social media in r/{subreddit_name} (Query: '{query_text}'): {e}")
+        except Exception as e:
+            logger.error(f"General Error fetching Reddit social media in r/{subreddit_name} (Query: '{query_text}'): {e}")
+
+    def normalize(item):
+        city_name, submission = item
+        matches = city_keyword_matcher.match(f"{submission.title}\n{submission.selftext or ''}")
+        matched_keywords = matches["keyword"]
+        if city_name is None:
+            # General subreddit: credit every city named in the post, if it is on-topic
+            if not matched_keywords:
+                return
+            matched_cities = matches["city"]
+        else:
+            matched_cities = [city_name]
+        for matched_city in matched_cities:
+            post_doc = {
+                "reddit_id": submission.id,
+                "location": matched_city,
+                "source": "social_media_reddit",
+                "subreddit": submission.subreddit.display_name,
+                "title": submission.title,
+                "text": submission.selftext if submission.selftext else submission.title,
+                "keywords": matched_keywords,
+                "created_utc": submission.created_utc,
+                "est_datetime": est_time,
+                "url": submission.url,
+                "permalink": f"https://www.reddit.com{submission.permalink}",
+                "score": submission.score,
+                "num_comments": submission.num_comments,
+                "timestamp": current_timestamp
+            }
+            yield {"reddit_id": submission.id, "location": matched_city}, post_doc
+
+    stats = IngestPipeline("social_media", fetch, normalize, writer, fetch_workers=REDDIT_MAX_WORKERS).run(plan)
+    if not writer.errors and not stats["errors"]:
+        watermarks.save()
+    logger.info(f"Total Reddit social media documents stored: {stats['normalized']} (upserted={writer.upserted}, modified={writer.modified})")
+
+# Conditionally fetch an RSS feed through the pooled session. Returns
+# (entries, new_state); entries is None when the feed has not changed since
+# the last successful cycle (304, identical body or identical entry set)
+def fetch_feed_if_changed(feed_url, source):
+    state = feed_state_collection.find_one({"feed_url": feed_url}) or {}
+    headers = {'User-Agent': ua.random}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    response = timed_get(source, feed_url, headers=headers, timeout=10)
+    if response.status_code == 304:
+        logger.info(f"Feed not modified (304): {feed_url}")
+        return None, {"checked_at": time.time()}
+    response.raise_for_status()
+
+    new_state = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": hashlib.sha256(response.content).hexdigest(),
+        "checked_at": time.time()
+    }
+    if new_state["content_hash"] == state.get("content_hash"):
+        logger.info(f"Feed body unchanged, skipping parse: {feed_url}")
+        return None, new_state
+
+    with INGEST_PHASE_SECONDS.time(source=source, phase="parse"):
+        feed = feedparser.parse(response.content)
+    entry_ids = sorted(getattr(entry, 'id', None) or getattr(entry, 'link', None) or getattr(entry, 'title', "") for entry in feed.entries)
+    new_state["entries_hash"] = hashlib.sha256("\n".join(entry_ids).encode("utf-8")).hexdigest()
+    if new_state["entries_hash"] == state.get("entries_hash"):
+        logger.info(f"Feed entry set unchanged, skipping write: {feed_url}")
+        return None, new_state
+    return feed.entries, new_state
+
+# Record a feed's validators once its entries have been written
+def save_feed_state(feed_url, new_state):
+    try:
+        feed_state_collection.update_one({"feed_url": feed_url}, {"$set": new_state}, upsert=True)
     except Exception as e:
-        logger.error(f"Failed to initialize PRAW/Reddit instance: {e}")
-        return
+        logger.warning(f"Could not save feed state for {feed_url}: {e}")
 
-    for city_name, _, _, city_subreddit_name in locations:
-        subreddits_to_check = general_subreddits.copy()
-        if city_subreddit_name:
-            subreddits_to_check.append(city_subreddit_name)
+# Pipeline fetch stage for RSS sources: yields (feed_name, entry) for the first
+# limit entries of a changed feed and keeps its new validators in feed_states
+def iter_feed_entries(feed, source, feed_states, limit=10):
+    feed_name, feed_url = feed
+    entries, new_state = fetch_feed_if_changed(feed_url, source)
+    feed_states[feed_url] = new_state
+    for entry in (entries or [])[:limit]:
+        yield feed_name, entry
 
-        for subreddit_name in set(subreddits_to_check):
-            for keyword in keywords:
-                try:
-                    query_text = f"{keyword} {city_name}" if subreddit_name in general_subreddits else f"{keyword}"
-                    submissions = reddit_instance.subreddit(subreddit_name).search(query_text, sort="new", limit=15, time_filter="day")
-                    
-                    for submission in submissions:
-                        if (time.time() - submission.created_utc) <= 86400:
-                            post_doc = {
-                                "reddit_id": submission.id,
-                                "location": city_name,
-                                "source": "social_media_reddit",
-                                "subreddit": submission.subreddit.display_name,
-                                "title": submission.title,
-                                "text": submission.selftext if submission.selftext else submission.title,
-                                "created_utc": submission.created_utc,
-                                "est_datetime": est_time,
-                                "url": submission.url,
-                                "permalink": f"https://www.reddit.com{submission.permalink}",
-                                "score": submission.score,
-                                "num_comments": submission.num_comments,
-                                "timestamp": current_timestamp
-                            }
-                            existing_docs = social_media_collection.count_documents({"location": city_name})
-                            logger.info(f"Documents for {city_name} before update: {existing_docs}")
-                            result = social_media_collection.update_one(
-                                {"reddit_id": submission.id, "location": city_name},
-                                {"$set": post_doc},
-                                upsert=True
-                            )
-                            logger.info(f"Update result for {city_name}: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-                            inserted_doc = social_media_collection.find_one({"reddit_id": submission.id, "location": city_name})
-                            if inserted_doc:
-                                logger.info(f"Verified: Reddit post found: {submission.id} for {city_name} in r/{subreddit_name}")
-                            else:
-                                logger.error(f"Failed to find Reddit post: {submission.id} for {city_name} in r/{subreddit_name}")
-                            logger.info(f"Documents for {city_name} after update: {social_media_collection.count_documents({'location': city_name})}")
-                            count += 1
-                except praw.exceptions.PRAWException as e:
-                    logger.error(f"PRAW Error fetching Reddit social media for {city_name} in r/{subreddit_name} (Query: '{query_text}'): {e}")
-                except Exception as e:
-                    logger.error(f"General Error fetching Reddit social media for {city_name} in r/{subreddit_name} (Query: '{query_text}'): {e}")
-    logger.info(f"Total Reddit social media documents stored: {count}")
+# Save feed validators once the pipeline has written their entries
+def save_feed_states(feed_states, writer, stats):
+    if writer.errors or stats["errors"]:
+        return
+    for feed_url, new_state in feed_states.items():
+        save_feed_state(feed_url, new_state)
 
 # Fetch Labor Data (Reuters RSS for labor news)
 def fetch_labor_data():
-    count = 0
     est_time = get_est_datetime()
     current_timestamp = time.time()
-    labor_keywords = ["strike", "labor", "worker", "union", "contract", "wage", "hiring", "unemployment"]
-    try:
-        headers = {'User-Agent': ua.random}
-        feed = feedparser.parse("http://feeds.reuters.com/reuters/businessNews", agent=headers['User-Agent'])
-        for entry in feed.entries[:10]:
-            title = getattr(entry, 'title', "N/A")
-            summary = getattr(entry, 'summary', "N/A")
-            link = getattr(entry, 'link', None)
-
-            if any(lk in title.lower() or lk in summary.lower() for lk in labor_keywords):
-                city_found = False
-                for city, _, _, _ in locations:
-                    if city.lower() in title.lower() or city.lower() in summary.lower():
-                        labor_doc = {
-                            "location": city,
-                            "source": "labor",
-                            "title": title,
-                            "description": summary,
-                            "est_datetime": est_time,
-                            "url": link,
-                            "timestamp": current_timestamp
-                        }
-                        existing_docs = labor_collection.count_documents({"location": city})
-                        logger.info(f"Documents for {city} before update: {existing_docs}")
-                        result = labor_collection.update_one(
-                            {"title": title, "location": city, "est_datetime": est_time},
-                            {"$set": labor_doc},
-                            upsert=True
-                        )
-                        logger.info(f"Update result for {city}: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-                        inserted_doc = labor_collection.find_one({"title": title, "location": city, "est_datetime": est_time})
-                        if inserted_doc:
-                            logger.info(f"Verified: Labor document found for {city}: {title[:50]}...")
-                        else:
-                            logger.error(f"Failed to find labor document for {city}: {title[:50]}...")
-                        logger.info(f"Documents for {city} after update: {labor_collection.count_documents({'location': city})}")
-                        count += 1
-                        city_found = True
-                        break
-                if not city_found:
-                    labor_doc = {
-                        "location": "General",
-                        "source": "labor",
-                        "title": title,
-                        "description": summary,
-                        "est_datetime": est_time,
-                        "url": link,
-                        "timestamp": current_timestamp
-                    }
-                    existing_docs = labor_collection.count_documents({"location": "General"})
-                    logger.info(f"Documents for General before update: {existing_docs}")
-                    result = labor_collection.update_one(
-                        {"title": title, "location": "General", "est_datetime": est_time},
-                        {"$set": labor_doc},
-                        upsert=True
-                    )
-                    logger.info(f"Update result for General: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-                    inserted_doc = labor_collection.find_one({"title": title, "location": "General", "est_datetime": est_time})
-                    if inserted_doc:
-                        logger.info(f"Verified: General labor document found: {title[:50]}...")
-                    else:
-                        logger.error(f"Failed to find general labor document: {title[:50]}...")
-                    logger.info(f"Documents for General after update: {labor_collection.count_documents({'location': 'General'})}")
-                    count += 1
-        time.sleep(1)
-    except Exception as e:
-        logger.error(f"Error fetching labor data: {str(e)}")
-    logger.info(f"Total labor documents stored: {count}")
+    writer = BulkUpsertWriter(labor_collection, "labor")
+    sink = StorySink(writer)
+    feed_states = {}
+
+    def normalize(item):
+        feed_name, entry = item
+        title = getattr(entry, 'title', "N/A")
+        summary = getattr(entry, 'summary', "N/A")
+        link = getattr(entry, 'link', None)
+
+        matches = city_labor_matcher.match(f"{title}\n{summary}")
+        if not matches["keyword"]:
+            return
+        # Credit every city the story names, or "General" when it names none
+        story_locations = matches["city"] or ["General"]
+        labor_doc = {
+            "location": story_locations[0],
+            "locations": story_locations,
+            "source": "labor",
+            "sources": [feed_name],
+            "title": title,
+            "description": summary,
+            "keywords": matches["keyword"],
+            "est_datetime": est_time,
+            "url": link,
+            "timestamp": current_timestamp
+        }
+        yield {"title": title, "location": story_locations[0], "est_datetime": est_time}, labor_doc
+
+    def fetch(feed):
+        return iter_feed_entries(feed, "labor", feed_states)
+
+    stats = IngestPipeline("labor", fetch, normalize, sink).run([("reuters", REUTERS_BUSINESS_RSS)])
+    save_feed_states(feed_states, writer, stats)
+    logger.info(f"Total labor documents stored: {sink.written} (upserted={writer.upserted}, modified={writer.modified})")
 
 # Fetch Logistics Reports (FreightWaves and Supply Chain 24/7 RSS)
 def fetch_logistics_reports():
-    count = 0
     est_time = get_est_datetime()
     current_timestamp = time.time()
-    for feed_url in [FREIGHTWAVES_RSS, SUPPLYCHAIN247_RSS]:
+    writer = BulkUpsertWriter(logistics_collection, "logistics")
+    sink = StorySink(writer)
+    feed_states = {}
+    feeds = [("freightwaves", FREIGHTWAVES_RSS), ("supplychain247", SUPPLYCHAIN247_RSS)]
+
+    def normalize(item):
+        feed_name, entry = item
+        title = getattr(entry, 'title', "N/A")
+        summary = getattr(entry, 'summary', "N/A")
+        link = getattr(entry, 'link', None)
+
+        matches = city_keyword_matcher.match(f"{title}\n{summary}")
+        # Credit every city the story names, or "General" when it names none
+        story_locations = matches["city"] or ["General"]
+        logistics_doc = {
+            "location": story_locations[0],
+            "locations": story_locations,
+            "source": "logistics",
+            "sources": [feed_name],
+            "title": title,
+            "description": summary,
+            "keywords": matches["keyword"],
+            "est_datetime": est_time,
+            "url": link,
+            "timestamp": current_timestamp
+        }
+        yield {"title": title, "location": story_locations[0], "est_datetime": est_time}, logistics_doc
+
+    def fetch(feed):
+        return iter_feed_entries(feed, "logistics", feed_states)
+
+    stats = IngestPipeline("logistics", fetch, normalize, sink, fetch_workers=len(feeds)).run(feeds)
+    save_feed_states(feed_states, writer, stats)
+    logger.info(f"Total logistics documents stored: {sink.written} (upserted={writer.upserted}, modified={writer.modified})")
+
+# Per-source schedule: interval and timeout in seconds, and how many runs of the
+# same source may be in flight at once. Each can be overridden with
+# <SOURCE>_INTERVAL_SECONDS, <SOURCE>_TIMEOUT_SECONDS and <SOURCE>_MAX_CONCURRENCY.
+def source_schedule(name, job, interval, timeout, max_concurrency=1):
+    prefix = name.upper()
+    return {
+        "job": job,
+        "interval": int(os.environ.get(f"{prefix}_INTERVAL_SECONDS", interval)),
+        "timeout": int(os.environ.get(f"{prefix}_TIMEOUT_SECONDS", timeout)),
+        "max_concurrency": int(os.environ.get(f"{prefix}_MAX_CONCURRENCY", max_concurrency))
+    }
+
+SOURCE_SCHEDULES = {
+    "weather": source_schedule("weather", fetch_weather, interval=300, timeout=60),
+    "weather_forecast": source_schedule("weather_forecast", fetch_weather_forecast, interval=3600, timeout=300),
+    "news": source_schedule("news", fetch_news, interval=300, timeout=240),
+    "social_media": source_schedule("social_media", fetch_social_media, interval=300, timeout=600),
+    "labor": source_schedule("labor", fetch_labor_data, interval=300, timeout=120),
+    "logistics": source_schedule("logistics", fetch_logistics_reports, interval=300, timeout=120)
+}
+
+# Dispatches each source on its own interval to a shared worker pool. A source
+# that is still running when its next slot comes up is skipped (not queued),
+# runs past their timeout are flagged, and every run is recorded in ingest_runs.
+class SourceScheduler:
+    def __init__(self, sources, max_workers=None):
+        self.sources = sources
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or len(sources), thread_name_prefix="ingest")
+        self.lock = threading.Lock()
+        self.running = {name: {} for name in sources}
+
+    def start(self):
+        for name, source in self.sources.items():
+            schedule.every(source["interval"]).seconds.do(self.dispatch, name)
+            logger.info(f"Scheduled {name} every {source['interval']}s (timeout={source['timeout']}s, max_concurrency={source['max_concurrency']})")
+        schedule.every(OVERRUN_CHECK_SECONDS).seconds.do(self.check_overruns)
+        for name in self.sources:
+            self.dispatch(name)
+
+    def dispatch(self, name):
+        source = self.sources[name]
+        with self.lock:
+            if len(self.running[name]) >= source["max_concurrency"]:
+                logger.warning(f"Skipping {name} run: {len(self.running[name])} run(s) still in progress")
+                self.record(name, {"$inc": {"skipped": 1}})
+                INGEST_RUNS.inc(source=name, result="skipped")
+                return
+            run_id = object()
+            self.running[name][run_id] = {"started": time.time(), "overrun": False}
+        self.executor.submit(self.run, name, run_id)
+
+    def run(self, name, run_id):
+        started = self.running[name][run_id]["started"]
+        error = None
         try:
-            headers = {'User-Agent': ua.random}
-            feed = feedparser.parse(feed_url, agent=headers['User-Agent'])
-            for entry in feed.entries[:10]:
-                title = getattr(entry, 'title', "N/A")
-                summary = getattr(entry, 'summary', "N/A")
-                link = getattr(entry, 'link', None)
-
-                city_found = False
-                for city, _, _, _ in locations:
-                    if city.lower() in title.lower() or city.lower() in summary.lower():
-                        logistics_doc = {
-                            "location": city,
-                            "source": "logistics",
-                            "title": title,
-                            "description": summary,
-                            "est_datetime": est_time,
-                            "url": link,
-                            "timestamp": current_timestamp
-                        }
-                        existing_docs = logistics_collection.count_documents({"location": city})
-                        logger.info(f"Documents for {city} before update: {existing_docs}")
-                        result = logistics_collection.update_one(
-                            {"title": title, "location": city, "est_datetime": est_time},
-                            {"$set": logistics_doc},
-                            upsert=True
-                        )
-                        logger.info(f"Update result for {city}: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-                        inserted_doc = logistics_collection.find_one({"title": title, "location": city, "est_datetime": est_time})
-                        if inserted_doc:
-                            logger.info(f"Verified: Logistics document found for {city}: {title[:50]}...")
-                        else:
-                            logger.error(f"Failed to find logistics document for {city}: {title[:50]}...")
-                        logger.info(f"Documents for {city} after update: {logistics_collection.count_documents({'location': city})}")
-                        count += 1
-                        city_found = True
-                        break
-                if not city_found:
-                    logistics_doc = {
-                        "location": "General",
-                        "source": "logistics",
-                        "title": title,
-                        "description": summary,
-                        "est_datetime": est_time,
-                        "url": link,
-                        "timestamp": current_timestamp
-                    }
-                    existing_docs = logistics_collection.count_documents({"location": "General"})
-                    logger.info(f"Documents for General before update: {existing_docs}")
-                    result = logistics_collection.update_one(
-                        {"title": title, "location": "General", "est_datetime": est_time},
-                        {"$set": logistics_doc},
-                        upsert=True
-                    )
-                    logger.info(f"Update result for General: matched={result.matched_count}, modified={result.modified_count}, upserted_id={result.upserted_id}")
-                    inserted_doc = logistics_collection.find_one({"title": title, "location": "General", "est_datetime": est_time})
-                    if inserted_doc:
-                        logger.info(f"Verified: General logistics document found: {title[:50]}...")
-                    else:
-                        logger.error(f"Failed to find general logistics document: {title[:50]}...")
-                    logger.info(f"Documents for General after update: {logistics_collection.count_documents({'location': 'General'})}")
-                    count += 1
-            time.sleep(1)
+            self.sources[name]["job"]()
         except Exception as e:
-            logger.error(f"Error fetching logistics data: {str(e)}")
-    logger.info(f"Total logistics documents stored: {count}")
-
-# Main function to fetch all data
-def fetch_all_data():
-    logger.info("Starting data fetching...")
-    fetch_weather()
-    fetch_news()
-    fetch_social_media()
-    fetch_labor_data()
-    fetch_logistics_reports()
-    logger.info("Data fetching completed.")
-
-# Schedule the tasks
-schedule.every(5).minutes.do(fetch_all_data)
+            error = str(e)
+            logger.error(f"Ingestion job {name} failed: {error}")
+        finally:
+            with self.lock:
+                self.running[name].pop(run_id, None)
+        finished = time.time()
+        update = {"$set": {"last_run": finished, "last_duration": finished - started, "last_error": error}, "$inc": {"runs": 1}}
+        if error is None:
+            update["$set"]["last_success"] = finished
+        else:
+            update["$inc"]["failures"] = 1
+        self.record(name, update)
+        INGEST_RUNS.inc(source=name, result="success" if error is None else "failure")
+        INGEST_RUN_SECONDS.observe(finished - started, source=name)
+        logger.info(f"Ingestion job {name} finished in {finished - started:.1f}s")
+
+    def check_overruns(self):
+        now = time.time()
+        with self.lock:
+            overruns = []
+            for name, runs in self.running.items():
+                for run in runs.values():
+                    if not run["overrun"] and now - run["started"] > self.sources[name]["timeout"]:
+                        run["overrun"] = True
+                        overruns.append((name, now - run["started"]))
+        for name, elapsed in overruns:
+            logger.warning(f"Ingestion job {name} has been running for {elapsed:.0f}s, past its {self.sources[name]['timeout']}s timeout")
+            self.record(name, {"$inc": {"overruns": 1}, "$set": {"last_overrun": now}})
+            INGEST_RUNS.inc(source=name, result="overrun")
+
+    def record(self, name, update):
+        try:
+            ingest_runs_collection.update_one({"source": name}, update, upsert=True)
+        except Exception as e:
+            logger.warning(f"Could not record run state for {name}: {e}")
 
 # Run the scheduler
 logger.info("Starting data collection...")
+if METRICS_PORT:
+    try:
+        start_metrics_server(METRICS_PORT, host=METRICS_HOST)
+    except OSError as e:
+        logger.warning(f"Could not start metrics server on {METRICS_HOST}:{METRICS_PORT}: {e}")
+SourceScheduler(SOURCE_SCHEDULES, max_workers=INGEST_MAX_WORKERS).start()
 while True:
     schedule.run_pending()
-    time.sleep(1)
\ No newline at end of file
+    time.sleep(1)
@@ -0,0 +1,139 @@
+# Declarative index catalog for every collection used by data_pull.py,
+# dynamic_data_generation.py, risk_prediction_dashboard.py and app/.
+# ensure_indexes() diffs the catalog against index_information() and only
+# creates or modifies what differs, so restarts never rebuild existing indexes.
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# TTL (seconds) for the real-time signal collections written by data_pull.py
+SIGNAL_TTL_SECONDS = 86400
+
+# Signal collections are read by the dashboard as
+# find({"location": city, "timestamp": {"$gte": ...}}).sort("timestamp", -1)
+SIGNAL_INDEXES = [
+    {"keys": [("timestamp", 1)], "expireAfterSeconds": SIGNAL_TTL_SECONDS},
+    {"keys": [("location", 1), ("timestamp", -1)]}
+]
+
+# News, labor and logistics stories are upserted by {title, location, est_datetime};
+# collapsed near-duplicates are also found through their merged "locations" list
+STORY_INDEXES = SIGNAL_INDEXES + [
+    {"keys": [("title", 1), ("location", 1), ("est_datetime", 1)]},
+    {"keys": [("locations", 1), ("timestamp", -1)]}
+]
+
+INDEX_CATALOG = {
+    "supply_chain_db": {
+        # data_pull.py
+        "weather": SIGNAL_INDEXES + [
+            {"keys": [("location", 1), ("est_datetime", 1)]}
+        ],
+        "weather_forecast": [
+            {"keys": [("timestamp", 1)], "expireAfterSeconds": SIGNAL_TTL_SECONDS},
+            {"keys": [("location", 1)]}
+        ],
+        "news": STORY_INDEXES,
+        "social_media": SIGNAL_INDEXES + [
+            {"keys": [("reddit_id", 1), ("location", 1)]}
+        ],
+        "labor": STORY_INDEXES,
+        "logistics": STORY_INDEXES,
+        "feed_state": [
+            {"keys": [("feed_url", 1)], "unique": True}
+        ],
+        "ingest_runs": [
+            {"keys": [("source", 1)], "unique": True}
+        ],
+        "ingest_watermarks": [
+            {"keys": [("source", 1), ("location", 1), ("query", 1)], "unique": True}
+        ],
+        # dynamic_data_generation.py and contingency_planning.py
+        "fulfillment_centers": [
+            {"keys": [("FC_ID", 1)]}
+        ],
+        "inventory": [
+            {"keys": [("FC_ID", 1), ("Product_SKU", 1)]}
+        ],
+        "shipments": [
+            {"keys": [("Shipment_ID", 1)]},
+            {"keys": [("Product_SKU", 1), ("Status", 1)]},
+            # app/db/crud.py get_shipments_by_fc
+            {"keys": [("Fulfillment_Center", 1)]}
+        ],
+        # Append-only log of simulated inventory movements (INVENTORY_SIMULATION=delta)
+        "inventory_movements": [
+            {"keys": [("FC_ID", 1), ("Product_SKU", 1), ("timestamp", -1)]}
+        ],
+        # risk_prediction_dashboard.py: latest prompt per FC
+        "gemini_prompts": [
+            {"keys": [("fc_name", 1), ("timestamp", -1)]},
+            # Mongo tier of the Gemini response cache
+            {"keys": [("prompt_hash", 1), ("created_at", -1)]}
+        ],
+        # app/db/crud.py
+        "fc_details": [
+            {"keys": [("FC_ID", 1)]}
+        ]
+    },
+    # app/services/db_services.py
+    "supplysentinel": {
+        "fulfillment_center": [
+            {"keys": [("FC_ID", 1)]},
+            {"keys": [("Risk_Score", 1)]}
+        ],
+        "risk_snapshots": [
+            {"keys": [("FC_ID", 1), ("timestamp", -1)]}
+        ]
+    }
+}
+
+def _normalize_key(key):
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction) for field, direction in key)
+
+# Reconcile one collection against its catalog entry; returns (created, modified)
+def reconcile_collection_indexes(collection, specs):
+    existing = {}
+    for name, info in collection.index_information().items():
+        existing[_normalize_key(info["key"])] = (name, info)
+
+    created, modified = 0, 0
+    for spec in specs:
+        key = _normalize_key(spec["keys"])
+        options = {option: value for option, value in spec.items() if option != "keys"}
+        if key not in existing:
+            collection.create_index(list(key), **options)
+            logger.info(f"Created index {list(key)} {options} on {collection.name}")
+            created += 1
+            continue
+
+        name, info = existing[key]
+        wanted_ttl, current_ttl = options.get("expireAfterSeconds"), info.get("expireAfterSeconds")
+        if bool(options.get("unique", False)) != bool(info.get("unique", False)) or (wanted_ttl is None) != (current_ttl is None):
+            collection.drop_index(name)
+            collection.create_index(list(key), **options)
+            logger.info(f"Rebuilt index {name} on {collection.name} with {options}")
+            modified += 1
+        elif wanted_ttl is not None and int(wanted_ttl) != int(current_ttl):
+            collection.database.command("collMod", collection.name, index={"keyPattern": dict(key), "expireAfterSeconds": wanted_ttl})
+            logger.info(f"Changed TTL of index {name} on {collection.name} from {current_ttl}s to {wanted_ttl}s")
+            modified += 1
+    return created, modified
+
+# Reconcile the catalog entries for db (all of its collections, or only collection_names)
+def ensure_indexes(db, collection_names=None):
+    catalog = INDEX_CATALOG.get(db.name, {})
+    for collection_name in collection_names or catalog:
+        specs = catalog.get(collection_name)
+        if not specs:
+            logger.warning(f"No index catalog entry for {db.name}.{collection_name}")
+            continue
+        try:
+            created, modified = reconcile_collection_indexes(db[collection_name], specs)
+            if created or modified:
+                logger.info(f"Indexes reconciled for {collection_name}: created={created}, modified={modified}")
+            else:
+                logger.info(f"Indexes up to date for {collection_name}")
+        except Exception as e:
+            logger.warning(f"Could not reconcile indexes on {collection_name}: {e}")
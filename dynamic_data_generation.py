@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
 
 import random
-from faker import Faker
 from datetime import datetime, timedelta
 import pytz
 import time
 import string
-from pymongo import MongoClient
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pymongo import MongoClient, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
 import requests
 import logging
 import base64
 import os
 from dotenv import load_dotenv
+from db_indexes import ensure_indexes
+from entity_pools import EntityPools
+from snapshots import SNAPSHOT_FORMATS, export_snapshot, load_seed_documents
 
 # Load environment variables from .env file
 load_dotenv()
@@ -26,6 +33,30 @@ ATLAS_PRIVATE_KEY = os.environ.get("ATLAS_PRIVATE_KEY")
 PROJECT_ID = os.environ.get("PROJECT_ID")
 MONGO_URI = os.environ.get("MONGO_URI")
 
+# "bulk" draws each cycle's values as NumPy arrays and writes them with chunked
+# unordered bulk_write calls; "per_document" keeps one upsert per row
+GENERATION_MODE = os.environ.get("GENERATION_MODE", "bulk")
+BULK_WRITE_BATCH_SIZE = int(os.environ.get("BULK_WRITE_BATCH_SIZE", 500))
+
+# Optional seed making generated values reproducible across runs
+GENERATION_SEED = int(os.environ["GENERATION_SEED"]) if os.environ.get("GENERATION_SEED") else None
+
+# "reset" redraws every inventory Quantity each cycle; "delta" simulates
+# movements from shipments and periodic restocks and writes only changed rows
+INVENTORY_SIMULATION = os.environ.get("INVENTORY_SIMULATION", "reset")
+INVENTORY_MOVEMENT_LOG = os.environ.get("INVENTORY_MOVEMENT_LOG", "false").lower() in ("1", "true", "yes")
+RESTOCK_EVERY_CYCLES = int(os.environ.get("RESTOCK_EVERY_CYCLES", 12))
+RESTOCK_THRESHOLD = int(os.environ.get("RESTOCK_THRESHOLD", 100))
+RESTOCK_TARGET = int(os.environ.get("RESTOCK_TARGET", 1000))
+
+# Addresses and names pre-generated per city; with a seed set, pools are cached
+# under ENTITY_POOL_CACHE_DIR (if given) and reloaded on the next run
+ENTITY_POOL_SIZE = int(os.environ.get("ENTITY_POOL_SIZE", 2000))
+ENTITY_POOL_CACHE_DIR = os.environ.get("ENTITY_POOL_CACHE_DIR")
+
+# Rows generated per process-pool task in --scale mode
+SCALE_SHARD_SIZE = int(os.environ.get("SCALE_SHARD_SIZE", 50000))
+
 # MongoDB Setup
 try:
     client = MongoClient(
@@ -45,9 +76,17 @@ db = client["supply_chain_db"]
 fulfillment_centers_collection = db["fulfillment_centers"]
 shipments_collection = db["shipments"]
 inventory_collection = db["inventory"]
+id_counters_collection = db["id_counters"]
+inventory_movements_collection = db["inventory_movements"]
 
-# Initialize Faker for realistic data
-fake = Faker()
+# Reconcile indexes for the generated collections with the shared catalog
+ensure_indexes(db, ["fulfillment_centers", "shipments", "inventory", "inventory_movements"])
+
+# NumPy generator for pool draws and the bulk generation mode; GENERATION_SEED
+# also seeds random so the product catalog repeats
+rng = np.random.default_rng(GENERATION_SEED)
+if GENERATION_SEED is not None:
+    random.seed(GENERATION_SEED)
 
 # City to State Mapping
 city_to_state = {
@@ -154,6 +193,14 @@ for category, templates in product_data_templates.items():
 # Randomize FC order for distribution
 random.shuffle(fcs)
 
+# Entity pools are built on first use, once per seed per process
+entity_pools_by_seed = {}
+
+def get_entity_pools(seed=GENERATION_SEED):
+    if seed not in entity_pools_by_seed:
+        entity_pools_by_seed[seed] = EntityPools(city_to_state, size=ENTITY_POOL_SIZE, seed=seed, cache_dir=ENTITY_POOL_CACHE_DIR)
+    return entity_pools_by_seed[seed]
+
 # Helper Functions
 def generate_sku():
     prefix = "B0" + random.choice(string.ascii_uppercase) + random.choice(string.digits)
@@ -164,12 +211,39 @@ def generate_inventory_id():
     return f"INV{random.randint(100000, 999999)}"
 
 def generate_shipment_id():
-    return f"S{random.randint(100, 999)}"
+    return f"S{allocate_ids('shipment', 1, floor=1000)}"
+
+# Collision-free ID allocator: reserves count consecutive numbers for kind from
+# a counter in id_counters and returns the first one. Numbering starts at floor,
+# above the ranges used by the original random IDs.
+def allocate_ids(kind, count, floor=0):
+    id_counters_collection.update_one({"_id": kind}, {"$max": {"next": floor}}, upsert=True)
+    doc = id_counters_collection.find_one_and_update(
+        {"_id": kind}, {"$inc": {"next": count}}, return_document=ReturnDocument.AFTER
+    )
+    return doc["next"] - count
 
 def get_est_datetime():
     est = pytz.timezone("America/New_York")
     return datetime.now(est).strftime("%Y-%m-%d %H:%M:%S")
 
+# Send operations as unordered bulk_write calls of at most chunk_size each;
+# returns (upserted, modified, errors) summed over the chunks
+def bulk_write_chunks(collection, operations, chunk_size=None):
+    chunk_size = chunk_size or BULK_WRITE_BATCH_SIZE
+    upserted, modified, errors = 0, 0, 0
+    for start in range(0, len(operations), chunk_size):
+        try:
+            result = collection.bulk_write(operations[start:start + chunk_size], ordered=False)
+            upserted += result.upserted_count
+            modified += result.modified_count
+        except BulkWriteError as e:
+            upserted += e.details.get("nUpserted", 0)
+            modified += e.details.get("nModified", 0)
+            errors += len(e.details.get("writeErrors", []))
+            logger.error(f"Bulk write to {collection.name} had {len(e.details.get('writeErrors', []))} errors: {e.details.get('writeErrors', [])[:3]}")
+    return upserted, modified, errors
+
 # Generate Fulfillment Centers
 def generate_fulfillment_centers():
     for fc in fcs:
@@ -206,10 +280,11 @@ def generate_shipments():
     all_fcs_data = list(fulfillment_centers_collection.find({}, {"FC_ID": 1, "city": 1, "Latitude": 1, "Longitude": 1}))
     if not all_fcs_data:
         logger.warning("No FCs found in DB to generate shipments against. Skipping shipment generation.")
-        return
+        return []
 
     all_cities = list(city_coordinates.keys())  # All possible destination cities
     num_shipments_to_generate = random.randint(10, 25)
+    generated = []
     
     for i in range(num_shipments_to_generate):
         shipment_id = generate_shipment_id()
@@ -231,11 +306,11 @@ def generate_shipments():
         source_lat, source_lon = source_fc_doc["Latitude"], source_fc_doc["Longitude"]
 
         dest_city = random.choice(all_cities)
-        dest_state = city_to_state[dest_city]
         base_lat, base_lon = city_coordinates[dest_city]
         dest_lat = base_lat + random.uniform(-0.01, 0.01)
         dest_lon = base_lon + random.uniform(-0.01, 0.01)
-        dest_address = fake.address().split("\n")[0] + f", {dest_city}, {dest_state}"
+        dest_address = get_entity_pools().sample_one("address", dest_city, rng)
+        recipient_name = get_entity_pools().sample_one("name", dest_city, rng)
 
         order_volume = random.randint(20, 500)
         
@@ -253,6 +328,7 @@ def generate_shipments():
             "Destination_Lat": dest_lat,
             "Destination_Lon": dest_lon,
             "Destination_Address": dest_address,
+            "Recipient_Name": recipient_name,
             "Expected_Arrival": get_est_datetime(),
             "Is_Emergency_Product": chosen_product["Is_Emergency"],
             "initial_shipping_cost": random.uniform(50.0, 500.0),
@@ -263,7 +339,9 @@ def generate_shipments():
             {"$set": doc},
             upsert=True
         )
+        generated.append(doc)
         logger.info(f"Updated/Inserted shipment: {shipment_id} ({sku}) for FC {source_fc_id}")
+    return generated
 
 # Generate Inventory
 def generate_inventory():
@@ -273,7 +351,6 @@ def generate_inventory():
         for product_template in defined_products:
             inventory_id = generate_inventory_id()
             random_city = random.choice(cities)
-            random_state = city_to_state[random_city]
             doc = {
                 "Inventory_ID": inventory_id,
                 "FC_ID": fc_id,
@@ -282,7 +359,7 @@ def generate_inventory():
                 "Product_SKU": product_template["Product_SKU"],
                 "Product_Description": product_template["Product_Description"],
                 "Is_Emergency_Defined": product_template["Is_Emergency"],
-                "Final_Delivery_Address": fake.address().split("\n")[0] + f", {random_city}, {random_state}"
+                "Final_Delivery_Address": get_entity_pools().sample_one("address", random_city, rng)
             }
             inventory_collection.update_one(
                 {"FC_ID": fc_id, "Product_SKU": product_template["Product_SKU"]},
@@ -291,20 +368,411 @@ def generate_inventory():
             )
             logger.info(f"Updated/Inserted inventory: {product_template['Product_SKU']} for FC {fc_id}")
 
+# Generate Inventory (bulk): one quantity/address draw per FC x product as
+# NumPy arrays, written in chunked bulk upserts
+def generate_inventory_bulk():
+    cities = list(city_coordinates.keys())  # All possible cities
+    shape = (len(fcs), len(defined_products))
+    quantities = rng.integers(50, 1001, size=shape)
+    inventory_ids = rng.integers(100000, 1000000, size=shape)
+    address_cities = rng.integers(0, len(cities), size=shape)
+    addresses = get_entity_pools().sample("address", get_entity_pools().city_indices(cities)[address_cities], rng)
+
+    operations = []
+    for i, fc in enumerate(fcs):
+        fc_id = fc_to_fc_id[fc]
+        for j, product_template in enumerate(defined_products):
+            doc = {
+                "Inventory_ID": f"INV{inventory_ids[i, j]}",
+                "FC_ID": fc_id,
+                "L1_Category": product_template["L1_Category"],
+                "Quantity": int(quantities[i, j]),
+                "Product_SKU": product_template["Product_SKU"],
+                "Product_Description": product_template["Product_Description"],
+                "Is_Emergency_Defined": product_template["Is_Emergency"],
+                "Final_Delivery_Address": str(addresses[i, j])
+            }
+            operations.append(UpdateOne({"FC_ID": fc_id, "Product_SKU": product_template["Product_SKU"]}, {"$set": doc}, upsert=True))
+    upserted, modified, errors = bulk_write_chunks(inventory_collection, operations)
+    logger.info(f"Bulk inventory write: {len(operations)} rows for {len(fcs)} FCs (upserted={upserted}, modified={modified}, errors={errors})")
+
+# Generate Shipments (bulk): products, FCs, destinations, volumes and costs are
+# drawn as NumPy columns for the whole cycle, then written in chunked bulk upserts
+def generate_shipments_bulk():
+    all_fcs_data = list(fulfillment_centers_collection.find({}, {"FC_ID": 1, "city": 1, "Latitude": 1, "Longitude": 1}))
+    if not all_fcs_data:
+        logger.warning("No FCs found in DB to generate shipments against. Skipping shipment generation.")
+        return []
+
+    all_cities = list(city_coordinates.keys())  # All possible destination cities
+    emergency_products = np.array([i for i, p in enumerate(defined_products) if p["Is_Emergency"]])
+    statuses = ["Pending", "In Transit", "Out for Delivery"]
+    route_types = ["inbound", "outbound"]
+    n = int(rng.integers(10, 26))
+
+    is_emergency = rng.random(n) < 0.4
+    if emergency_products.size == 0:
+        is_emergency[:] = False
+    product_idx = rng.integers(0, len(defined_products), size=n)
+    if emergency_products.size:
+        product_idx[is_emergency] = emergency_products[rng.integers(0, emergency_products.size, size=int(is_emergency.sum()))]
+    source_idx = rng.integers(0, len(all_fcs_data), size=n)
+    dest_idx = rng.integers(0, len(all_cities), size=n)
+    base = np.array([city_coordinates[city] for city in all_cities])[dest_idx]
+    pool_rows = get_entity_pools().city_indices(all_cities)[dest_idx]
+    dest_addresses = get_entity_pools().sample("address", pool_rows, rng)
+    recipient_names = get_entity_pools().sample("name", pool_rows, rng)
+    dest_coords = base + rng.uniform(-0.01, 0.01, size=(n, 2))
+    order_volumes = rng.integers(20, 501, size=n)
+    status_idx = rng.integers(0, len(statuses), size=n)
+    route_idx = rng.integers(0, len(route_types), size=n)
+    costs = rng.uniform(50.0, 500.0, size=n)
+    tat_days = rng.integers(1, 8, size=n)
+    first_shipment_id = allocate_ids("shipment", n, floor=1000)
+    expected_arrival = get_est_datetime()
+
+    docs, operations = [], []
+    for k in range(n):
+        product = defined_products[product_idx[k]]
+        source_fc_doc = all_fcs_data[source_idx[k]]
+        shipment_id = f"S{first_shipment_id + k}"
+        doc = {
+            "Shipment_ID": shipment_id,
+            "Product_SKU": product["Product_SKU"],
+            "L1_Category": product["L1_Category"],
+            "Product_Description": product["Product_Description"],
+            "Order_Volume": int(order_volumes[k]),
+            "Status": statuses[status_idx[k]],
+            "Route_Type": route_types[route_idx[k]],
+            "Source_FC_ID": source_fc_doc["FC_ID"],
+            "Source_Lat": source_fc_doc["Latitude"],
+            "Source_Lon": source_fc_doc["Longitude"],
+            "Destination_Lat": float(dest_coords[k, 0]),
+            "Destination_Lon": float(dest_coords[k, 1]),
+            "Destination_Address": str(dest_addresses[k]),
+            "Recipient_Name": str(recipient_names[k]),
+            "Expected_Arrival": expected_arrival,
+            "Is_Emergency_Product": product["Is_Emergency"],
+            "initial_shipping_cost": float(costs[k]),
+            "initial_delivery_tat_days": int(tat_days[k])
+        }
+        docs.append(doc)
+        operations.append(UpdateOne({"Shipment_ID": shipment_id}, {"$set": doc}, upsert=True))
+    upserted, modified, errors = bulk_write_chunks(shipments_collection, operations)
+    logger.info(f"Bulk shipment write: {n} shipments (upserted={upserted}, modified={modified}, errors={errors})")
+    return docs
+
+# --- Scale generation for load testing ---
+# A one-off network of fc_count FCs, sku_count SKUs and shipment_count
+# shipments. Every shard rebuilds the FC and SKU tables from the same seeds, so
+# only (offset, count, seed) crosses the process boundary, and IDs come from
+# allocate_ids so repeated runs grow the dataset instead of overwriting it.
+
+product_template_list = [(category, template) for category, templates in product_data_templates.items() for template in templates]
+scale_statuses = ["Pending", "In Transit", "Out for Delivery"]
+scale_route_types = ["inbound", "outbound"]
+
+# FC table: cities assigned round-robin, positions jittered by up to spread degrees
+def build_scale_fcs(fc_count, first_fc_number, spread, seed):
+    fc_rng = np.random.default_rng(seed)
+    cities = list(city_coordinates.keys())
+    fc_cities = [cities[i % len(cities)] for i in range(fc_count)]
+    coords = np.array([city_coordinates[city] for city in fc_cities]) + fc_rng.uniform(-spread, spread, size=(fc_count, 2))
+    current_risk = fc_rng.integers(0, 101, size=fc_count)
+    max_risk = fc_rng.integers(5, 51, size=fc_count)
+    cost_multiplier = fc_rng.uniform(1.1, 1.5, size=fc_count)
+    tat_adder = fc_rng.integers(1, 4, size=fc_count)
+    fc_docs = []
+    for i, city in enumerate(fc_cities):
+        number = first_fc_number + i
+        fc_docs.append({
+            "FC_ID": f"{city.replace(' ', '')}FC{number}",
+            "FC_Name": f"{city} FC {number}",
+            "city": city,
+            "Latitude": float(coords[i, 0]),
+            "Longitude": float(coords[i, 1]),
+            "current_risk_score": int(current_risk[i]),
+            "max_risk_score": int(max_risk[i]),
+            "flagged": bool(current_risk[i] > 50),
+            "re_routing_cost_multiplier": float(cost_multiplier[i]),
+            "re_routing_tat_adder_days": int(tat_adder[i])
+        })
+    return fc_docs
+
+# SKU table: each SKU takes a product template; returns the template index per SKU
+def build_scale_skus(sku_count, seed):
+    return np.random.default_rng(seed).integers(0, len(product_template_list), size=sku_count)
+
+# Worker: inventory rows for FCs [fc_offset, fc_offset + fc_shard_count)
+def generate_scale_inventory_shard(network, fc_offset, fc_shard_count, first_inventory_number, seed):
+    shard_rng = np.random.default_rng(seed)
+    fc_docs = build_scale_fcs(network["fc_count"], network["first_fc_number"], network["spread"], network["fc_seed"])
+    sku_templates = build_scale_skus(network["sku_count"], network["sku_seed"])
+    per_fc = min(network["inventory_per_fc"], network["sku_count"])
+    cities = list(city_coordinates.keys())
+    pools = get_entity_pools(network["pool_seed"])
+
+    docs = []
+    inserted = 0
+    for i in range(fc_offset, fc_offset + fc_shard_count):
+        fc_id = fc_docs[i]["FC_ID"]
+        sku_idx = shard_rng.choice(network["sku_count"], size=per_fc, replace=False)
+        quantities = shard_rng.integers(50, 1001, size=per_fc)
+        addresses = pools.sample("address", pools.city_indices(cities)[shard_rng.integers(0, len(cities), size=per_fc)], shard_rng)
+        for j in range(per_fc):
+            category, template = product_template_list[sku_templates[sku_idx[j]]]
+            docs.append({
+                "Inventory_ID": f"INV{first_inventory_number + (i - fc_offset) * per_fc + j}",
+                "FC_ID": fc_id,
+                "L1_Category": category,
+                "Quantity": int(quantities[j]),
+                "Product_SKU": f"SKU{network['first_sku_number'] + sku_idx[j]}",
+                "Product_Description": template["desc"],
+                "Is_Emergency_Defined": template["is_emergency"],
+                "Final_Delivery_Address": str(addresses[j])
+            })
+            if len(docs) >= BULK_WRITE_BATCH_SIZE:
+                inserted += len(inventory_collection.insert_many(docs, ordered=False).inserted_ids)
+                docs = []
+    if docs:
+        inserted += len(inventory_collection.insert_many(docs, ordered=False).inserted_ids)
+    return inserted
+
+# Worker: shipment_shard_count shipments numbered from first_shipment_number
+def generate_scale_shipments_shard(network, shipment_shard_count, first_shipment_number, seed):
+    shard_rng = np.random.default_rng(seed)
+    fc_docs = build_scale_fcs(network["fc_count"], network["first_fc_number"], network["spread"], network["fc_seed"])
+    sku_templates = build_scale_skus(network["sku_count"], network["sku_seed"])
+    cities = list(city_coordinates.keys())
+    pools = get_entity_pools(network["pool_seed"])
+    n = shipment_shard_count
+
+    source_idx = shard_rng.integers(0, len(fc_docs), size=n)
+    sku_idx = shard_rng.integers(0, network["sku_count"], size=n)
+    dest_idx = shard_rng.integers(0, len(cities), size=n)
+    dest_coords = np.array([city_coordinates[city] for city in cities])[dest_idx] + shard_rng.uniform(-network["spread"], network["spread"], size=(n, 2))
+    order_volumes = shard_rng.integers(20, 501, size=n)
+    status_idx = shard_rng.integers(0, len(scale_statuses), size=n)
+    route_idx = shard_rng.integers(0, len(scale_route_types), size=n)
+    costs = shard_rng.uniform(50.0, 500.0, size=n)
+    tat_days = shard_rng.integers(1, 8, size=n)
+    pool_rows = pools.city_indices(cities)[dest_idx]
+    dest_addresses = pools.sample("address", pool_rows, shard_rng)
+    recipient_names = pools.sample("name", pool_rows, shard_rng)
+    expected_arrival = get_est_datetime()
+
+    docs = []
+    inserted = 0
+    for k in range(n):
+        category, template = product_template_list[sku_templates[sku_idx[k]]]
+        source_fc_doc = fc_docs[source_idx[k]]
+        docs.append({
+            "Shipment_ID": f"S{first_shipment_number + k}",
+            "Product_SKU": f"SKU{network['first_sku_number'] + sku_idx[k]}",
+            "L1_Category": category,
+            "Product_Description": template["desc"],
+            "Order_Volume": int(order_volumes[k]),
+            "Status": scale_statuses[status_idx[k]],
+            "Route_Type": scale_route_types[route_idx[k]],
+            "Source_FC_ID": source_fc_doc["FC_ID"],
+            "Source_Lat": source_fc_doc["Latitude"],
+            "Source_Lon": source_fc_doc["Longitude"],
+            "Destination_Lat": float(dest_coords[k, 0]),
+            "Destination_Lon": float(dest_coords[k, 1]),
+            "Destination_Address": str(dest_addresses[k]),
+            "Recipient_Name": str(recipient_names[k]),
+            "Expected_Arrival": expected_arrival,
+            "Is_Emergency_Product": template["is_emergency"],
+            "initial_shipping_cost": float(costs[k]),
+            "initial_delivery_tat_days": int(tat_days[k])
+        })
+        if len(docs) >= BULK_WRITE_BATCH_SIZE:
+            inserted += len(shipments_collection.insert_many(docs, ordered=False).inserted_ids)
+            docs = []
+    if docs:
+        inserted += len(shipments_collection.insert_many(docs, ordered=False).inserted_ids)
+    return inserted
+
+# Generate a scale network, sharding inventory and shipments across a process pool
+def generate_scale_network(fc_count, sku_count, shipment_count, inventory_per_fc=200, spread=0.5, seed=None, workers=None):
+    started = time.time()
+    fc_seed, sku_seed, inventory_seed, shipment_seed = np.random.SeedSequence(seed).spawn(4)
+    network = {
+        "fc_count": fc_count,
+        "sku_count": sku_count,
+        "inventory_per_fc": inventory_per_fc,
+        "spread": spread,
+        "fc_seed": fc_seed,
+        "sku_seed": sku_seed,
+        "pool_seed": seed,
+        "first_fc_number": allocate_ids("fulfillment_center", fc_count, floor=len(fcs) + 1),
+        "first_sku_number": allocate_ids("sku", sku_count, floor=1000000)
+    }
+
+    fc_docs = build_scale_fcs(fc_count, network["first_fc_number"], spread, fc_seed)
+    for start in range(0, len(fc_docs), BULK_WRITE_BATCH_SIZE):
+        fulfillment_centers_collection.insert_many(fc_docs[start:start + BULK_WRITE_BATCH_SIZE], ordered=False)
+    logger.info(f"Inserted {len(fc_docs)} scale FCs starting at FC {network['first_fc_number']}")
+
+    per_fc = min(inventory_per_fc, sku_count)
+    fcs_per_shard = max(1, SCALE_SHARD_SIZE // max(1, per_fc))
+    inventory_shards = [(offset, min(fcs_per_shard, fc_count - offset)) for offset in range(0, fc_count, fcs_per_shard)]
+    first_inventory_number = allocate_ids("inventory", fc_count * per_fc, floor=1000000)
+    shipment_shards = [(offset, min(SCALE_SHARD_SIZE, shipment_count - offset)) for offset in range(0, shipment_count, SCALE_SHARD_SIZE)]
+    first_shipment_number = allocate_ids("shipment", shipment_count, floor=1000)
+
+    # Spawned workers each open their own MongoClient when they import this module
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        inventory_futures = [
+            pool.submit(generate_scale_inventory_shard, network, offset, count, first_inventory_number + offset * per_fc, shard_seed)
+            for (offset, count), shard_seed in zip(inventory_shards, inventory_seed.spawn(len(inventory_shards)))
+        ]
+        shipment_futures = [
+            pool.submit(generate_scale_shipments_shard, network, count, first_shipment_number + offset, shard_seed)
+            for (offset, count), shard_seed in zip(shipment_shards, shipment_seed.spawn(len(shipment_shards)))
+        ]
+        inventory_rows = sum(future.result() for future in inventory_futures)
+        shipment_rows = sum(future.result() for future in shipment_futures)
+
+    elapsed = time.time() - started
+    logger.info(
+        f"Scale network generated in {elapsed:.1f}s: {fc_count} FCs, {sku_count} SKUs, {inventory_rows} inventory rows "
+        f"({len(inventory_shards)} shards), {shipment_rows} shipments ({len(shipment_shards)} shards)"
+    )
+
+# Stateful inventory simulation for INVENTORY_SIMULATION=delta. Quantities are
+# loaded once and then only moved: outbound shipments deplete their source FC
+# (never below zero), inbound shipments add to it, and every restock_every
+# cycles rows under restock_threshold are topped up to restock_target. Only
+# rows that moved are written, as $inc updates, and each movement can also be
+# appended to inventory_movements.
+class InventorySimulator:
+    def __init__(self, movement_log=False, restock_every=None, restock_threshold=None, restock_target=None):
+        self.movement_log = movement_log
+        self.restock_every = restock_every or RESTOCK_EVERY_CYCLES
+        self.restock_threshold = restock_threshold if restock_threshold is not None else RESTOCK_THRESHOLD
+        self.restock_target = restock_target or RESTOCK_TARGET
+        self.quantities = {}
+        self.cycle = 0
+
+    def load(self):
+        self.quantities = {
+            (doc["FC_ID"], doc["Product_SKU"]): doc.get("Quantity", 0)
+            for doc in inventory_collection.find({}, {"FC_ID": 1, "Product_SKU": 1, "Quantity": 1})
+        }
+        logger.info(f"Inventory simulation loaded {len(self.quantities)} rows")
+
+    # Movements for one cycle as (key, delta, reason, shipment_id, quantity_after),
+    # applied to the local state
+    def movements(self, shipments):
+        movements = []
+        for shipment in shipments:
+            key = (shipment["Source_FC_ID"], shipment["Product_SKU"])
+            if key not in self.quantities:
+                continue
+            if shipment["Route_Type"] == "outbound":
+                delta = -min(shipment["Order_Volume"], self.quantities[key])
+            else:
+                delta = shipment["Order_Volume"]
+            if delta:
+                self.quantities[key] += delta
+                movements.append((key, delta, shipment["Route_Type"], shipment["Shipment_ID"], self.quantities[key]))
+
+        self.cycle += 1
+        if self.cycle % self.restock_every == 0 and self.quantities:
+            keys = list(self.quantities)
+            quantities = np.fromiter(self.quantities.values(), dtype=np.int64, count=len(keys))
+            for i in np.flatnonzero(quantities < self.restock_threshold):
+                delta = int(self.restock_target - quantities[i])
+                self.quantities[keys[i]] += delta
+                movements.append((keys[i], delta, "restock", None, self.quantities[keys[i]]))
+        return movements
+
+    def step(self, shipments):
+        movements = self.movements(shipments)
+        net = {}
+        for key, delta, _, _, _ in movements:
+            net[key] = net.get(key, 0) + delta
+        operations = [
+            UpdateOne({"FC_ID": fc_id, "Product_SKU": sku}, {"$inc": {"Quantity": delta}})
+            for (fc_id, sku), delta in net.items() if delta
+        ]
+        upserted, modified, errors = bulk_write_chunks(inventory_collection, operations)
+        if self.movement_log and movements:
+            timestamp = time.time()
+            log_docs = [
+                {"FC_ID": fc_id, "Product_SKU": sku, "Delta": delta, "Reason": reason, "Shipment_ID": shipment_id,
+                 "Quantity_After": quantity_after, "timestamp": timestamp}
+                for (fc_id, sku), delta, reason, shipment_id, quantity_after in movements
+            ]
+            for start in range(0, len(log_docs), BULK_WRITE_BATCH_SIZE):
+                inventory_movements_collection.insert_many(log_docs[start:start + BULK_WRITE_BATCH_SIZE], ordered=False)
+        logger.info(f"Inventory simulation cycle {self.cycle}: {len(movements)} movements, {len(operations)} rows changed (modified={modified}, errors={errors})")
+
+# Refresh inventory and shipments in the configured generation mode; with a
+# simulator, inventory moves by the new shipments instead of being reset
+def generate_cycle(simulator=None):
+    if simulator is not None:
+        shipments = generate_shipments() if GENERATION_MODE == "per_document" else generate_shipments_bulk()
+        simulator.step(shipments)
+    elif GENERATION_MODE == "per_document":
+        generate_inventory()
+        generate_shipments()
+    else:
+        generate_inventory_bulk()
+        generate_shipments_bulk()
+
 # Main Loop for Continuous Updates
 def main():
-    logger.info("Starting initial data generation for dynamic_data_generation.py...")
+    logger.info(f"Starting initial data generation for dynamic_data_generation.py ({GENERATION_MODE} mode, {INVENTORY_SIMULATION} inventory)...")
     generate_fulfillment_centers()
-    generate_inventory()
-    generate_shipments()
+    generate_cycle()
+    simulator = None
+    if INVENTORY_SIMULATION == "delta":
+        simulator = InventorySimulator(movement_log=INVENTORY_MOVEMENT_LOG)
+        simulator.load()
     logger.info("Initial data generation complete. Starting continuous updates...")
 
     while True:
         logger.info(f"Generating incremental data at {get_est_datetime()}")
-        generate_inventory()
-        generate_shipments()
+        generate_cycle(simulator)
         logger.info("Incremental data generation complete, sleeping for 300 seconds...")
         time.sleep(300)
 
+# Write the generated collections and the data/*.json seeds to a file snapshot
+# that snapshots.load_planning_inputs() can load without a database
+def export_dataset(out_dir, fmt="parquet"):
+    collections = {
+        "fulfillment_centers": fulfillment_centers_collection.find({}, {"_id": 0}),
+        "inventory": inventory_collection.find({}, {"_id": 0}),
+        "shipments": shipments_collection.find({}, {"_id": 0})
+    }
+    collections.update(load_seed_documents(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")))
+    counts = export_snapshot(out_dir, collections, fmt)
+    logger.info(f"Exported {fmt} snapshot to {out_dir}: {counts}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic fulfillment center, inventory and shipment data.")
+    parser.add_argument("--scale", action="store_true", help="generate a one-off network of the size below instead of running the continuous loop")
+    parser.add_argument("--fcs", type=int, default=1000, help="number of FCs (default: 1000)")
+    parser.add_argument("--skus", type=int, default=100000, help="number of SKUs (default: 100000)")
+    parser.add_argument("--shipments", type=int, default=1000000, help="number of shipments (default: 1000000)")
+    parser.add_argument("--inventory-per-fc", type=int, default=200, help="SKUs stocked per FC (default: 200)")
+    parser.add_argument("--spread", type=float, default=0.5, help="max FC/destination offset from its city, in degrees (default: 0.5)")
+    parser.add_argument("--seed", type=int, default=GENERATION_SEED, help="seed for reproducible values (default: GENERATION_SEED)")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--export", metavar="DIR", help="write FCs, inventory, shipments and data/*.json seeds to a snapshot in DIR (after --scale, if given) and exit")
+    parser.add_argument("--export-format", choices=SNAPSHOT_FORMATS, default="parquet", help="snapshot file format (default: parquet)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.scale:
+        generate_scale_network(
+            args.fcs, args.skus, args.shipments,
+            inventory_per_fc=args.inventory_per_fc, spread=args.spread, seed=args.seed, workers=args.workers
+        )
+    if args.export:
+        export_dataset(args.export, args.export_format)
+    if not args.scale and not args.export:
+        main()
\ No newline at end of file
@@ -0,0 +1,80 @@
+# Pre-generated per-city pools of synthetic entities (delivery addresses and
+# recipient names) for dynamic_data_generation.py. Pools are built once from a
+# seeded Faker, optionally cached to disk as .npz, and sampled with vectorized
+# index draws, so generation cost no longer scales with Faker provider calls.
+
+import hashlib
+import logging
+import os
+import numpy as np
+from faker import Faker
+
+logger = logging.getLogger(__name__)
+
+POOL_KINDS = ["address", "name"]
+
+class EntityPools:
+    def __init__(self, city_to_state, size=2000, seed=None, cache_dir=None):
+        self.city_to_state = dict(city_to_state)
+        self.cities = list(self.city_to_state)
+        self.city_index = {city: i for i, city in enumerate(self.cities)}
+        self.size = size
+        self.seed = seed
+        self.cache_dir = cache_dir
+        self.pools = self._load() or self._build()
+
+    # Cache files are keyed by seed, size and city list; unseeded pools are never cached
+    def _cache_path(self):
+        if not self.cache_dir or self.seed is None:
+            return None
+        digest = hashlib.sha256("|".join(f"{city},{state}" for city, state in self.city_to_state.items()).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"entity_pools_{self.seed}_{self.size}_{digest}.npz")
+
+    def _load(self):
+        path = self._cache_path()
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                pools = {kind: data[kind] for kind in POOL_KINDS}
+            logger.info(f"Loaded entity pools from {path}")
+            return pools
+        except Exception as e:
+            logger.warning(f"Could not load entity pools from {path}, rebuilding: {e}")
+            return None
+
+    def _build(self):
+        fake = Faker()
+        fake.seed_instance(self.seed)
+        pools = {
+            "address": np.array([
+                [f"{fake.street_address()}, {city}, {state}" for _ in range(self.size)]
+                for city, state in self.city_to_state.items()
+            ]),
+            "name": np.array([
+                [fake.name() for _ in range(self.size)]
+                for _ in self.cities
+            ])
+        }
+        logger.info(f"Built entity pools: {len(self.cities)} cities x {self.size} entries")
+        path = self._cache_path()
+        if path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez_compressed(path, **pools)
+                logger.info(f"Cached entity pools to {path}")
+            except Exception as e:
+                logger.warning(f"Could not cache entity pools to {path}: {e}")
+        return pools
+
+    # Pool row for each city name, for turning drawn city positions into pool rows
+    def city_indices(self, cities):
+        return np.array([self.city_index[city] for city in cities])
+
+    # One entry of kind per pool row in city_rows, drawn uniformly with rng
+    def sample(self, kind, city_rows, rng):
+        city_rows = np.asarray(city_rows)
+        return self.pools[kind][city_rows, rng.integers(0, self.size, size=city_rows.shape)]
+
+    def sample_one(self, kind, city, rng):
+        return str(self.pools[kind][self.city_index[city], rng.integers(0, self.size)])
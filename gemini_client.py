@@ -0,0 +1,274 @@
+# Process-wide Gemini plumbing for risk_prediction_dashboard.py.
+# GeminiModelResolver lists the available models once, picks the first entry
+# of PRIORITY_MODELS that supports generateContent and reuses its
+# GenerativeModel for every FC and every session, re-resolving only after
+# ttl_seconds or when a request reports the model as not found.
+# GeminiResponseCache serves parsed responses for prompts that were already
+# answered within its TTL, from an in-process LRU and then from the
+# gemini_prompts collection. The JSON helpers describe and validate the
+# structured-output mode's response schema.
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_MODELS = [
+    "gemini-1.5-flash-latest", "models/gemini-1.5-flash-latest",
+    "gemini-2.0-flash", "models/gemini-2.0-flash",
+    "gemini-1.5-flash-002", "models/gemini-1.5-flash-002",
+    "gemini-1.5-flash", "models/gemini-1.5-flash",
+    "gemini-2.5-pro-preview-06-05", "models/gemini-2.5-pro-preview-06-05",
+    "gemini-1.5-pro-latest", "models/gemini-1.5-pro-latest",
+    "gemini-1.5-pro-002", "models/gemini-1.5-pro-002",
+    "gemini-1.5-pro", "models/gemini-1.5-pro",
+    "gemini-1.0-pro-latest", "models/gemini-1.0-pro-latest",
+    "gemini-1.0-pro-001", "models/gemini-1.0-pro-001",
+    "gemini-1.0-pro", "models/gemini-1.0-pro",
+    "gemini-pro", "models/gemini-pro",
+]
+
+GEMINI_LIST_MODELS_SECONDS = REGISTRY.histogram("gemini_list_models_seconds", "Latency of genai.list_models() during model resolution")
+GEMINI_MODEL_RESOLUTIONS = REGISTRY.counter("gemini_model_resolutions_total", "Gemini model resolutions by trigger", ["reason"])
+GEMINI_REQUEST_SECONDS = REGISTRY.histogram("gemini_request_seconds", "Latency of Gemini generate_content requests", ["model"])
+GEMINI_BATCH_FCS = REGISTRY.counter("gemini_batch_fcs_total", "FCs sent in batched Gemini requests by outcome (parsed, retried)", ["result"])
+GEMINI_PARSE_RESULTS = REGISTRY.counter("gemini_parse_results_total", "Gemini answers by output format and parse outcome (ok, repaired, failed)", ["format", "result"])
+GEMINI_CACHE_LOOKUPS = REGISTRY.counter("gemini_response_cache_lookups_total", "Gemini response cache lookups by outcome (lru_hit, mongo_hit, miss)", ["result"])
+
+class GeminiModelResolver:
+    def __init__(self, api_key, ttl_seconds=3600, candidates=PRIORITY_MODELS):
+        genai.configure(api_key=api_key)
+        self.ttl_seconds = ttl_seconds
+        self.candidates = list(candidates)
+        self.lock = threading.Lock()
+        self.model_name = None
+        self.model = None
+        self.resolved_at = 0
+        self.stale_reason = "initial"
+
+    def _resolve(self):
+        GEMINI_MODEL_RESOLUTIONS.inc(reason=self.stale_reason)
+        with GEMINI_LIST_MODELS_SECONDS.time():
+            available_models = [
+                m.name for m in genai.list_models()
+                if 'generateContent' in m.supported_generation_methods and "vision" not in m.name and "image-generation" not in m.name
+            ]
+        logger.info(f"Available Gemini models supporting generateContent (text only): {available_models}")
+        model_name = next((candidate for candidate in self.candidates if candidate in available_models), None)
+        if not model_name:
+            raise LookupError("No suitable Gemini model found that supports generateContent from the priority list.")
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.resolved_at = time.time()
+        logger.info(f"Using Gemini model: {model_name}")
+
+    # (model_name, GenerativeModel), listing models only when nothing is cached
+    # or the cached choice has expired
+    def get(self):
+        with self.lock:
+            if self.model is None or time.time() - self.resolved_at > self.ttl_seconds:
+                if self.model is not None:
+                    self.stale_reason = "ttl"
+                self._resolve()
+            return self.model_name, self.model
+
+    def invalidate(self, model_name, reason="not_found"):
+        with self.lock:
+            if self.model_name == model_name:
+                self.model = None
+                self.stale_reason = reason
+
+    # generate_content on the resolved model; a model-not-found error re-resolves
+    # and retries once. Returns (model_name, response).
+    def generate(self, prompt, **kwargs):
+        model_name, model = self.get()
+        try:
+            with GEMINI_REQUEST_SECONDS.time(model=model_name):
+                return model_name, model.generate_content(prompt, **kwargs)
+        except google_exceptions.NotFound as e:
+            logger.warning(f"Gemini model {model_name} not found, re-resolving: {e}")
+            self.invalidate(model_name)
+        model_name, model = self.get()
+        with GEMINI_REQUEST_SECONDS.time(model=model_name):
+            return model_name, model.generate_content(prompt, **kwargs)
+
+# Rough prompt size in tokens (about four characters per token for English text)
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+# Batched requests answer each FC in a block opened by this marker line
+BATCH_MARKER = "=== FC: {} ==="
+BATCH_MARKER_PATTERN = re.compile(r"^[\s\-*#>]*=+\s*FC:\s*(.+?)\s*=+[\s*]*$", re.MULTILINE)
+
+# {fc_name: answer text} for every requested FC whose marker appears in a
+# batched response; unknown or repeated names are ignored
+def split_batch_response(text, fc_names):
+    matches = list(BATCH_MARKER_PATTERN.finditer(text))
+    blocks = {}
+    for i, match in enumerate(matches):
+        name = match.group(1).strip("* ")
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        if name in fc_names and name not in blocks:
+            blocks[name] = text[match.end():end].strip()
+    return blocks
+
+RISK_STATUSES = ["Low Risk", "Medium Risk", "High Risk"]
+
+# Response schemas for generation_config; the SDK upper-cases the type names
+RISK_RESPONSE_PROPERTIES = {
+    "risk_score": {"type": "number"},
+    "status": {"type": "string", "enum": RISK_STATUSES},
+    "reasoning": {"type": "string"},
+    "emergency_classifications": {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "sku": {"type": "string"},
+                "emergency": {"type": "boolean"},
+                "reason": {"type": "string"}
+            },
+            "required": ["sku", "emergency", "reason"]
+        }
+    }
+}
+RISK_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": RISK_RESPONSE_PROPERTIES,
+    "required": list(RISK_RESPONSE_PROPERTIES)
+}
+BATCH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "fcs": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"fc_name": {"type": "string"}, **RISK_RESPONSE_PROPERTIES},
+                "required": ["fc_name"] + list(RISK_RESPONSE_PROPERTIES)
+            }
+        }
+    },
+    "required": ["fcs"]
+}
+
+def json_generation_config(schema):
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+# (risk_score, status, reasoning, emergency_classifications) from one decoded
+# answer object; raises ValueError naming the first problem found
+def validate_risk_json(data):
+    if not isinstance(data, dict):
+        raise ValueError("answer is not a JSON object")
+    missing = [field for field in RISK_RESPONSE_PROPERTIES if field not in data]
+    if missing:
+        raise ValueError(f"missing fields {missing}")
+    risk_score = data["risk_score"]
+    if isinstance(risk_score, bool) or not isinstance(risk_score, (int, float)) or not 0 <= risk_score <= 100:
+        raise ValueError(f"risk_score must be a number from 0 to 100, got {risk_score!r}")
+    if data["status"] not in RISK_STATUSES:
+        raise ValueError(f"status must be one of {RISK_STATUSES}, got {data['status']!r}")
+    if not isinstance(data["reasoning"], str):
+        raise ValueError("reasoning must be a string")
+    if not isinstance(data["emergency_classifications"], list):
+        raise ValueError("emergency_classifications must be a list")
+    emergency_classifications = []
+    for item in data["emergency_classifications"]:
+        if not isinstance(item, dict) or not isinstance(item.get("sku"), str) or not isinstance(item.get("emergency"), bool):
+            raise ValueError(f"invalid emergency classification {item!r}")
+        emergency_classifications.append({"SKU": item["sku"], "Emergency": item["emergency"], "Reason": str(item.get("reason", ""))})
+    return float(risk_score), data["status"], data["reasoning"].strip(), emergency_classifications
+
+def parse_risk_json(text):
+    return validate_risk_json(json.loads(text))
+
+# {fc_name: answer object} from a batched JSON answer; entries are validated
+# separately so one bad FC doesn't discard the others
+def parse_batch_json(text, fc_names):
+    data = json.loads(text)
+    if not isinstance(data, dict) or not isinstance(data.get("fcs"), list):
+        raise ValueError("answer has no fcs list")
+    entries = {}
+    for entry in data["fcs"]:
+        if isinstance(entry, dict) and entry.get("fc_name") in fc_names and entry["fc_name"] not in entries:
+            entries[entry["fc_name"]] = entry
+    return entries
+
+# Short follow-up asking the model to fix an answer that failed validation;
+# it carries the bad answer and the error, not the FC's data again
+def repair_prompt(fc_name, bad_answer, error):
+    return (
+        f"Your risk assessment for {fc_name} could not be used: {error}.\n"
+        f"Return the same assessment as one JSON object with exactly these fields: "
+        f"risk_score (number 0-100), status (one of {', '.join(RISK_STATUSES)}), reasoning (string), "
+        f"emergency_classifications (list of objects with sku, emergency (true/false) and reason).\n"
+        f"Previous answer:\n{bad_answer[:4000]}"
+    )
+
+# Trailing whitespace and blank lines don't change what the model is asked
+def normalize_prompt(prompt):
+    return "\n".join(line.rstrip() for line in prompt.strip().splitlines() if line.strip())
+
+def prompt_hash(model_name, prompt):
+    return hashlib.sha256(f"{model_name}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+# Parsed responses keyed by prompt_hash(). Entries are (result, created_at);
+# put() only fills the LRU, and the Mongo tier reads back the prompt_hash,
+# created_at and result fields the caller stores with each gemini_prompts
+# document, so nothing is written twice. ttl_seconds=0 disables the cache.
+class GeminiResponseCache:
+    RESULT_FIELDS = ["risk_score", "status", "reasoning", "emergency_classifications"]
+
+    def __init__(self, collection, ttl_seconds=1800, max_entries=512):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    # (result, created_at, tier) for a fresh entry, or None
+    def get(self, key):
+        if not self.ttl_seconds:
+            return None
+        cutoff = time.time() - self.ttl_seconds
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] >= cutoff:
+                self.entries.move_to_end(key)
+                GEMINI_CACHE_LOOKUPS.inc(result="lru_hit")
+                return entry[0], entry[1], "lru"
+            if entry:
+                del self.entries[key]
+        try:
+            doc = self.collection.find_one(
+                {"prompt_hash": key, "created_at": {"$gte": cutoff}},
+                {field: 1 for field in self.RESULT_FIELDS + ["created_at"]},
+                sort=[("created_at", -1)]
+            )
+        except Exception as e:
+            logger.warning(f"Gemini response cache lookup failed: {e}")
+            doc = None
+        if doc and all(field in doc for field in self.RESULT_FIELDS):
+            result = tuple(doc[field] for field in self.RESULT_FIELDS)
+            self.put(key, result, doc["created_at"])
+            GEMINI_CACHE_LOOKUPS.inc(result="mongo_hit")
+            return result, doc["created_at"], "mongo"
+        GEMINI_CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    def put(self, key, result, created_at=None):
+        if not self.ttl_seconds:
+            return
+        with self.lock:
+            self.entries[key] = (result, created_at or time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
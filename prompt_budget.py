@@ -0,0 +1,57 @@
+# Token-budgeted assembly of the per-FC data section of the Gemini risk prompt.
+# Each PromptSection is a header, lines that are always kept (e.g. category
+# totals) and candidate lines ordered most important first. Candidate lines
+# with the same key are merged into one line with a repeat count, and
+# fit_sections() shares the token budget between sections so that short
+# sections are kept whole and long ones are cut from the end with a note.
+
+from gemini_client import estimate_tokens
+
+class PromptSection:
+    def __init__(self, name, header, lines, empty_text, fixed_lines=()):
+        self.name = name
+        self.header = header
+        self.fixed_lines = list(fixed_lines)
+        self.lines = dedupe_lines(lines)
+        self.empty_text = empty_text
+
+    def render(self, kept):
+        if not self.fixed_lines and not self.lines:
+            return self.header + self.empty_text + "\n"
+        text = self.header + "".join(line + "\n" for line in self.fixed_lines + self.lines[:kept])
+        if kept < len(self.lines):
+            text += f"- ... {len(self.lines) - kept} more omitted to fit the prompt budget\n"
+        return text
+
+# lines are (key, text) pairs; the first text seen for a key is kept (inputs
+# are newest first) and later duplicates only add to its count
+def dedupe_lines(lines):
+    merged = {}
+    for key, text in lines:
+        if key in merged:
+            merged[key][1] += 1
+        else:
+            merged[key] = [text, 1]
+    return [text if count == 1 else f"{text} (x{count})" for text, count in merged.values()]
+
+# Returns (text, {section name: estimated tokens}). Headers, fixed lines and
+# empty-section notes always fit; the rest of token_budget is water-filled
+# across sections in order of need. token_budget <= 0 keeps everything.
+def fit_sections(sections, token_budget):
+    costs = {section.name: [estimate_tokens(line + "\n") for line in section.lines] for section in sections}
+    kept = {section.name: len(section.lines) for section in sections}
+    if token_budget > 0:
+        remaining = token_budget - sum(estimate_tokens(section.render(0)) for section in sections)
+        pending = sorted(sections, key=lambda section: sum(costs[section.name]))
+        for index, section in enumerate(pending):
+            allowance = max(0, remaining) / (len(pending) - index)
+            used, count = 0, 0
+            for cost in costs[section.name]:
+                if used + cost > allowance:
+                    break
+                used += cost
+                count += 1
+            kept[section.name] = count
+            remaining -= used
+    rendered = [(section.name, section.render(kept[section.name])) for section in sections]
+    return "".join(text for _, text in rendered), {name: estimate_tokens(text) for name, text in rendered}
@@ -3,16 +3,27 @@
 import streamlit as st
 import pandas as pd
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure
 import pytz
 from datetime import datetime, timedelta
 import logging
 import requests
 import base64
 import time
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-import google.generativeai as genai
-from geopy.distance import geodesic
+from db_indexes import ensure_indexes
+from gemini_client import (
+    BATCH_MARKER, BATCH_RESPONSE_SCHEMA, GEMINI_BATCH_FCS, GEMINI_PARSE_RESULTS, RISK_RESPONSE_SCHEMA,
+    GeminiModelResolver, GeminiResponseCache, estimate_tokens, json_generation_config, parse_batch_json,
+    parse_risk_json, prompt_hash, repair_prompt, split_batch_response
+)
+from metrics import start_metrics_server
+from prompt_budget import PromptSection, fit_sections
+from contingency_planning import generate_contingency_plan
 import re
 import requests.utils
 import plotly.express as px
@@ -165,6 +176,38 @@ PROJECT_ID = os.environ.get("PROJECT_ID")
 MONGO_URI = os.environ.get("MONGO_URI")
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+# Per-FC scoring runs on a thread pool: at most FC_MAX_CONCURRENCY FCs in
+# flight, each Gemini request capped at GEMINI_TIMEOUT_SECONDS, and each FC's
+# whole prompt/predict/plan/store step at FC_TASK_TIMEOUT_SECONDS
+FC_MAX_CONCURRENCY = int(os.environ.get("FC_MAX_CONCURRENCY", 8))
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", 60))
+FC_TASK_TIMEOUT_SECONDS = float(os.environ.get("FC_TASK_TIMEOUT_SECONDS", 90))
+
+# FCs per batched Gemini request (1 sends one request per FC) and the
+# estimated data tokens one batched request may carry
+GEMINI_BATCH_SIZE = int(os.environ.get("GEMINI_BATCH_SIZE", 1))
+GEMINI_BATCH_TOKEN_BUDGET = int(os.environ.get("GEMINI_BATCH_TOKEN_BUDGET", 24000))
+
+# json: schema-constrained JSON answers, validated and repaired once on failure;
+# text: the free-text "Risk Score: / Status: / ..." format parsed with regexes
+GEMINI_OUTPUT_FORMAT = os.environ.get("GEMINI_OUTPUT_FORMAT", "json").lower()
+
+# Estimated tokens the per-FC data section (signals and inventory) may use;
+# 0 disables the limit
+GEMINI_PROMPT_TOKEN_BUDGET = int(os.environ.get("GEMINI_PROMPT_TOKEN_BUDGET", 4000))
+
+# How long a resolved Gemini model is reused before models are listed again
+GEMINI_MODEL_TTL_SECONDS = float(os.environ.get("GEMINI_MODEL_TTL_SECONDS", 3600))
+
+# Identical prompts (same model) within GEMINI_CACHE_TTL_SECONDS reuse the
+# earlier response instead of calling Gemini (0 disables)
+GEMINI_CACHE_TTL_SECONDS = float(os.environ.get("GEMINI_CACHE_TTL_SECONDS", 1800))
+GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", 512))
+
+# Prometheus text metrics for the dashboard process (0 disables)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+DASHBOARD_METRICS_PORT = int(os.environ.get("DASHBOARD_METRICS_PORT", 9109))
+
 # Check if all required environment variables are set
 required_vars = ["ATLAS_PUBLIC_KEY", "ATLAS_PRIVATE_KEY", "PROJECT_ID", "MONGO_URI", "GEMINI_API_KEY"]
 for var in required_vars:
@@ -200,6 +243,136 @@ social_media_collection = db["social_media"]
 news_collection = db["news"]
 labor_collection = db["labor"]
 logistics_collection = db["logistics"]
+weather_forecast_collection = db["weather_forecast"]
+
+# Reconcile indexes once per process (Streamlit reruns this script on every interaction)
+@st.cache_resource
+def reconcile_indexes():
+    ensure_indexes(db)
+    return True
+
+reconcile_indexes()
+
+# Collections whose changes can alter an FC row: signal collections are tied to
+# it by city, inventory by FC_ID and shipments by source FC_ID and SKU
+SIGNAL_COLLECTIONS = ["weather", "weather_forecast", "news", "social_media", "labor", "logistics"]
+WATCHED_COLLECTIONS = SIGNAL_COLLECTIONS + ["inventory", "shipments", "fulfillment_centers"]
+
+# Background change-stream watcher. Every change is mapped to the ("city", ...),
+# ("fc", FC_ID) or ("sku", ...) keys it touches and stamped with a sequence
+# number; a session remembers the sequence its rows were computed at and
+# recomputes only the FCs changed since. Change streams need a replica set (a
+# local single-node one works); on a standalone server available stays False
+# and the dashboard keeps its full timed refresh.
+class FCChangeWatcher:
+    def __init__(self, database):
+        self.db = database
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.reset_sequence = 0
+        self.versions = {}
+        self.available = False
+        self.resume_token = None
+
+    def start(self):
+        threading.Thread(target=self.run, name="fc-change-watcher", daemon=True).start()
+        return self
+
+    def run(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": WATCHED_COLLECTIONS}}}]
+        backoff = 1
+        while True:
+            try:
+                with self.db.watch(pipeline, full_document="updateLookup", resume_after=self.resume_token) as stream:
+                    self.available = True
+                    backoff = 1
+                    logger.info(f"Watching change streams on {', '.join(WATCHED_COLLECTIONS)}")
+                    for change in stream:
+                        self.resume_token = stream.resume_token
+                        self.mark(self.keys_for_change(change))
+            except OperationFailure as e:
+                self.available = False
+                if e.code == 40573:
+                    logger.warning("Change streams need a replica set; falling back to full timed refreshes")
+                    return
+                if e.code in (280, 286):
+                    # Resume point fell off the oplog: changes may have been missed
+                    logger.warning(f"Change stream history lost, invalidating all FCs: {e}")
+                    self.resume_token = None
+                    self.mark(None)
+                else:
+                    logger.error(f"Change stream failed: {e}")
+            except Exception as e:
+                self.available = False
+                logger.error(f"Change stream failed: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    # Keys touched by one change event; None means every FC may be affected
+    def keys_for_change(self, change):
+        collection = change["ns"]["coll"]
+        doc = change.get("fullDocument")
+        if collection == "fulfillment_centers":
+            return None
+        if doc is None:
+            # Signal deletes are TTL expiries of items already outside the 24h prompt window
+            return [] if collection in SIGNAL_COLLECTIONS else None
+        if collection in SIGNAL_COLLECTIONS:
+            cities = {doc.get("location")} | set(doc.get("locations") or [])
+            return [("city", city) for city in cities if city]
+        if collection == "inventory":
+            return [("fc", doc.get("FC_ID"))]
+        return [("fc", doc.get("Source_FC_ID")), ("sku", doc.get("Product_SKU"))]
+
+    def mark(self, keys):
+        with self.lock:
+            self.sequence += 1
+            if keys is None:
+                self.reset_sequence = self.sequence
+                return
+            for key in keys:
+                self.versions[key] = self.sequence
+
+    # Keys changed after sequence seen, or None when everything must be recomputed
+    def changed_since(self, seen):
+        with self.lock:
+            if not self.available or self.reset_sequence > seen:
+                return None
+            return {key for key, version in self.versions.items() if version > seen}
+
+# One watcher per process, shared by every session
+@st.cache_resource
+def get_change_watcher():
+    return FCChangeWatcher(db).start()
+
+change_watcher = get_change_watcher()
+
+# One model resolver per process: models are listed once and the
+# GenerativeModel is shared by every FC worker and session
+@st.cache_resource
+def get_gemini_model_resolver():
+    return GeminiModelResolver(GEMINI_API_KEY, ttl_seconds=GEMINI_MODEL_TTL_SECONDS)
+
+gemini_model_resolver = get_gemini_model_resolver()
+
+# Response cache shared across sessions; its second tier is gemini_prompts
+@st.cache_resource
+def get_gemini_response_cache():
+    return GeminiResponseCache(gemini_prompts_collection, ttl_seconds=GEMINI_CACHE_TTL_SECONDS, max_entries=GEMINI_CACHE_MAX_ENTRIES)
+
+gemini_response_cache = get_gemini_response_cache()
+
+@st.cache_resource
+def start_dashboard_metrics_server():
+    if not DASHBOARD_METRICS_PORT:
+        return None
+    try:
+        return start_metrics_server(DASHBOARD_METRICS_PORT, host=METRICS_HOST)
+    except OSError as e:
+        logger.warning(f"Could not start metrics server on {METRICS_HOST}:{DASHBOARD_METRICS_PORT}: {e}")
+        return None
+
+start_dashboard_metrics_server()
 
 # Fetch FCs dynamically from database with coordinates
 def get_fcs():
@@ -583,120 +756,210 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def gemini_predict(prompt, fc_name="Unknown FC"):
-    if not GEMINI_API_KEY:
-        logger.error("GEMINI_API_KEY is not available for Gemini API configuration.")
-        return 50, "Unknown", "GEMINI_API_KEY not found.", []
-  
-    genai.configure(api_key=GEMINI_API_KEY)
+# Parse a free-text "Risk Score / Status / Reasoning / Emergency Classifications"
+# answer into (risk_score, status, reasoning, emergency_classifications)
+def parse_risk_response(generated_text, fc_name="Unknown FC"):
+    # Default values
+    risk_score = 50
+    status = "Unknown"
+    reasoning = ""
+    emergency_classifications = []
   
-    try:
-        list_models_response = genai.list_models()
-        available_models = [
-            m.name for m in list_models_response
-            if 'generateContent' in m.supported_generation_methods and "vision" not in m.name and "image-generation" not in m.name
-        ]
-        logger.info(f"Available Gemini models supporting generateContent (text only): {available_models}")
-      
-        model_name = None
-        priority_models_candidates = [
-            "gemini-1.5-flash-latest", "models/gemini-1.5-flash-latest",
-            "gemini-2.0-flash", "models/gemini-2.0-flash",
-            "gemini-1.5-flash-002", "models/gemini-1.5-flash-002",
-            "gemini-1.5-flash", "models/gemini-1.5-flash",
-            "gemini-2.5-pro-preview-06-05", "models/gemini-2.5-pro-preview-06-05",  
-            "gemini-1.5-pro-latest", "models/gemini-1.5-pro-latest",
-            "gemini-1.5-pro-002", "models/gemini-1.5-pro-002",
-            "gemini-1.5-pro", "models/gemini-1.5-pro",
-            "gemini-1.0-pro-latest", "models/gemini-1.0-pro-latest",
-            "gemini-1.0-pro-001", "models/gemini-1.0-pro-001",
-            "gemini-1.0-pro", "models/gemini-1.0-pro",
-            "gemini-pro", "models/gemini-pro",
-        ]
+    # Extract Risk Score
+    risk_score_match = re.search(r"Risk Score:\s*(\d+\.?\d*)", generated_text)
+    if risk_score_match:
+        risk_score = float(risk_score_match.group(1))
       
-        for p_model in priority_models_candidates:
-            if p_model in available_models:
-                model_name = p_model
-                break
+    # Extract Status
+    status_match = re.search(r"Status:\s*(.+)", generated_text)
+    if status_match:
+        raw_status = status_match.group(1).strip()
+        cleaned_status = re.sub(r'\*+', '', raw_status).strip()
+        status = cleaned_status.title()
+        if status not in ["Low Risk", "Medium Risk", "High Risk"]:
+            status = "Low Risk"
+            logger.warning(f"Unexpected status format for FC {fc_name}: {raw_status}, defaulting to 'Low Risk'")
           
-        if not model_name:
-            logger.error("No suitable Gemini model found that supports generateContent from the priority list.")
-            return 50, "Unknown", "No suitable Gemini model found.", []
-      
-        model = genai.GenerativeModel(model_name)
-        logger.info(f"Using Gemini model: {model_name}")
+    # Extract Reasoning
+    reasoning_section_match = re.search(r"Reasoning:\s*(.*?)(?=\nEmergency Classifications:|\Z)", generated_text, re.DOTALL)
+    if reasoning_section_match:
+        reasoning = reasoning_section_match.group(1).strip()
+    else:
+        reasoning = "No reasoning provided."
       
+    # Extract Emergency Classifications
+    start_index = generated_text.find("Emergency Classifications:")
+    if start_index != -1:
+        emergency_text = generated_text[start_index + len("Emergency Classifications:"):].strip()
+        lines = emergency_text.split('\n')
+        for line in lines:
+            line = line.strip()
+            if line:
+                parts = [part.strip() for part in line.split(',')]
+                if len(parts) >= 3:
+                    sku_part = parts[0]
+                    emergency_part = parts[1]
+                    reason_part = ', '.join(parts[2:])
+                  
+                    sku = sku_part.split(':')[1].strip() if ':' in sku_part else sku_part
+                    emergency = emergency_part.split(':')[1].strip() == "True" if ':' in emergency_part else emergency_part == "True"
+                    reason = reason_part.split(':')[1].strip() if ':' in reason_part else reason_part
+                  
+                    emergency_classifications.append({"SKU": sku, "Emergency": emergency, "Reason": reason})
+    else:
+        logger.warning(f"No Emergency Classifications found for FC {fc_name}")
+    return risk_score, status, reasoning, emergency_classifications
+
+# Current model name (cached per process; models are only listed on first use,
+# after the TTL or after a not-found error), or an error result instead
+def resolve_gemini_model():
+    if not GEMINI_API_KEY:
+        logger.error("GEMINI_API_KEY is not available for Gemini API configuration.")
+        return None, (50, "Unknown", "GEMINI_API_KEY not found.", [])
+    try:
+        model_name, _ = gemini_model_resolver.get()
+        return model_name, None
+    except LookupError as e:
+        logger.error(str(e))
+        return None, (50, "Unknown", "No suitable Gemini model found.", [])
     except Exception as e:
         logger.error(f"Error listing or selecting Gemini models: {str(e)}")
-        return 50, "Unknown", f"Error listing or selecting Gemini models: {str(e)}", []
+        return None, (50, "Unknown", f"Error listing or selecting Gemini models: {str(e)}", [])
+
+# cache_info receives the prompt_hash, model_name and created_at to store with
+# the gemini_prompts document, which is what the response cache's Mongo tier
+# reads back; it stays empty for failed predictions
+def get_cached_prediction(model_name, prompt, fc_name, cache_info):
+    key = prompt_hash(model_name, prompt)
+    cached = gemini_response_cache.get(key)
+    if not cached:
+        return None
+    result, created_at, tier = cached
+    logger.info(f"Gemini response for FC {fc_name} served from {tier} cache")
+    cache_info.update(prompt_hash=key, model_name=model_name, created_at=created_at)
+    return result
+
+# Keyed by the model that answered, in case a not-found error switched it
+def store_prediction(model_name, prompt, result, cache_info):
+    key, created_at = prompt_hash(model_name, prompt), time.time()
+    gemini_response_cache.put(key, result, created_at)
+    cache_info.update(prompt_hash=key, model_name=model_name, created_at=created_at)
+
+def gemini_generation_kwargs(schema):
+    kwargs = {"request_options": {"timeout": GEMINI_TIMEOUT_SECONDS}}
+    if GEMINI_OUTPUT_FORMAT == "json":
+        kwargs["generation_config"] = json_generation_config(schema)
+    return kwargs
+
+# Returns (prediction, valid). JSON answers are validated and, when invalid,
+# repaired once with a short follow-up for this FC only; text answers go
+# through parse_risk_response. Invalid predictions are not cached.
+def parse_prediction(generated_text, fc_name="Unknown FC"):
+    if GEMINI_OUTPUT_FORMAT != "json":
+        valid = bool(re.search(r"Risk Score:\s*\d", generated_text) and re.search(r"Status:", generated_text))
+        GEMINI_PARSE_RESULTS.inc(format="text", result="ok" if valid else "failed")
+        return parse_risk_response(generated_text, fc_name), valid
+    try:
+        result = parse_risk_json(generated_text)
+        GEMINI_PARSE_RESULTS.inc(format="json", result="ok")
+        return result, True
+    except ValueError as e:
+        error = e
+    logger.warning(f"Invalid JSON answer for FC {fc_name} ({error}), sending repair prompt")
+    try:
+        _, response = gemini_model_resolver.generate(repair_prompt(fc_name, generated_text, error), **gemini_generation_kwargs(RISK_RESPONSE_SCHEMA))
+        result = parse_risk_json(response.text)
+        GEMINI_PARSE_RESULTS.inc(format="json", result="repaired")
+        return result, True
+    except Exception as e:
+        logger.error(f"Could not repair Gemini answer for FC {fc_name}: {str(e)}")
+    GEMINI_PARSE_RESULTS.inc(format="json", result="failed")
+    return (50, "Unknown", f"Could not parse Gemini answer: {error}", []), False
+
+# Returns (risk_score, status, reasoning, emergency_classifications); see
+# get_cached_prediction for cache_info
+def gemini_predict(prompt, fc_name="Unknown FC", cache_info=None):
+    cache_info = {} if cache_info is None else cache_info
+    model_name, error = resolve_gemini_model()
+    if error:
+        return error
+  
+    cached = get_cached_prediction(model_name, prompt, fc_name, cache_info)
+    if cached:
+        return cached
   
     try:
-        response = model.generate_content(prompt)
+        model_name, response = gemini_model_resolver.generate(prompt, **gemini_generation_kwargs(RISK_RESPONSE_SCHEMA))
         generated_text = response.text
         logger.info(f"Raw Gemini Output for FC: {fc_name}:\n{generated_text}")
-      
-        # Default values
-        risk_score = 50
-        status = "Unknown"
-        reasoning = ""
-        emergency_classifications = []
-      
-        # Extract Risk Score
-        risk_score_match = re.search(r"Risk Score:\s*(\d+\.?\d*)", generated_text)
-        if risk_score_match:
-            risk_score = float(risk_score_match.group(1))
-          
-        # Extract Status
-        status_match = re.search(r"Status:\s*(.+)", generated_text)
-        if status_match:
-            raw_status = status_match.group(1).strip()
-            cleaned_status = re.sub(r'\*+', '', raw_status).strip()
-            status = cleaned_status.title()
-            if status not in ["Low Risk", "Medium Risk", "High Risk"]:
-                status = "Low Risk"
-                logger.warning(f"Unexpected status format for FC {fc_name}: {raw_status}, defaulting to 'Low Risk'")
-              
-        # Extract Reasoning
-        reasoning_section_match = re.search(r"Reasoning:\s*(.*?)(?=\nEmergency Classifications:|\Z)", generated_text, re.DOTALL)
-        if reasoning_section_match:
-            reasoning = reasoning_section_match.group(1).strip()
-        else:
-            reasoning = "No reasoning provided."
-          
-        # Extract Emergency Classifications
-        start_index = generated_text.find("Emergency Classifications:")
-        if start_index != -1:
-            emergency_text = generated_text[start_index + len("Emergency Classifications:"):].strip()
-            lines = emergency_text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line:
-                    parts = [part.strip() for part in line.split(',')]
-                    if len(parts) >= 3:
-                        sku_part = parts[0]
-                        emergency_part = parts[1]
-                        reason_part = ', '.join(parts[2:])
-                      
-                        sku = sku_part.split(':')[1].strip() if ':' in sku_part else sku_part
-                        emergency = emergency_part.split(':')[1].strip() == "True" if ':' in emergency_part else emergency_part == "True"
-                        reason = reason_part.split(':')[1].strip() if ':' in reason_part else reason_part
-                      
-                        emergency_classifications.append({"SKU": sku, "Emergency": emergency, "Reason": reason})
-        else:
-            logger.warning(f"No Emergency Classifications found for FC {fc_name}")
-          
+        result, valid = parse_prediction(generated_text, fc_name)
         logger.info("Successfully received response from Gemini API")
-        return risk_score, status, reasoning, emergency_classifications
+        if valid:
+            store_prediction(model_name, prompt, result, cache_info)
+        return result
   
     except Exception as e:
         logger.error(f"Gemini prediction error with model {model_name}: {str(e)}")
         return 50, "Low Risk", f"Gemini prediction error: {str(e)}", []
-    
-# Generate Risk Prompt for Gemini
-def generate_risk_prompt(fc_name, city, fc_id, event_type, simulated_weather, simulated_social_media, simulated_inventory, simulated_news, simulated_labor, simulated_logistics):
-    current_time = time.time()
-    time_threshold = current_time - 86400
+
+# Several FCs in one request. entries are (fc_name, city, risk_prompt,
+# data_section) and the result is {fc_name: (prediction, cache_info)}. Cached
+# FCs are answered from the response cache (keyed by their single-FC prompt,
+# so batched and unbatched refreshes share it); the rest go out as one prompt
+# stating the instructions once, and any FC missing from the answer is retried
+# on its own.
+def gemini_predict_batch(entries):
+    if len(entries) == 1:
+        fc, _, risk_prompt, _ = entries[0]
+        cache_info = {}
+        return {fc: (gemini_predict(risk_prompt, fc_name=fc, cache_info=cache_info), cache_info)}
+    model_name, error = resolve_gemini_model()
+    if error:
+        return {fc: (error, {}) for fc, _, _, _ in entries}
+  
+    results = {}
+    pending = []
+    for fc, city, risk_prompt, data_section in entries:
+        cache_info = {}
+        cached = get_cached_prediction(model_name, risk_prompt, fc, cache_info)
+        if cached:
+            results[fc] = (cached, cache_info)
+        else:
+            pending.append((fc, city, risk_prompt, data_section))
+  
+    if len(pending) > 1:
+        fc_names = [fc for fc, _, _, _ in pending]
+        try:
+            batch_prompt = generate_batch_risk_prompt([(fc, city, data_section) for fc, city, _, data_section in pending])
+            model_name, response = gemini_model_resolver.generate(batch_prompt, **gemini_generation_kwargs(BATCH_RESPONSE_SCHEMA))
+            generated_text = response.text
+            logger.info(f"Raw Gemini batch output for FCs {fc_names}:\n{generated_text}")
+            if GEMINI_OUTPUT_FORMAT == "json":
+                blocks = {fc: json.dumps(entry) for fc, entry in parse_batch_json(generated_text, fc_names).items()}
+            else:
+                blocks = split_batch_response(generated_text, fc_names)
+        except Exception as e:
+            logger.error(f"Gemini batch prediction error with model {model_name} for FCs {fc_names}, retrying individually: {str(e)}")
+            blocks = {}
+        for fc, _, risk_prompt, _ in pending:
+            if fc in blocks:
+                result, valid = parse_prediction(blocks[fc], fc)
+                cache_info = {}
+                if valid:
+                    store_prediction(model_name, risk_prompt, result, cache_info)
+                results[fc] = (result, cache_info)
+                GEMINI_BATCH_FCS.inc(result="parsed")
+            else:
+                GEMINI_BATCH_FCS.inc(result="retried")
   
+    for fc, _, risk_prompt, _ in pending:
+        if fc not in results:
+            cache_info = {}
+            results[fc] = (gemini_predict(risk_prompt, fc_name=fc, cache_info=cache_info), cache_info)
+    return results
+    
+# Generate the single-FC Risk Prompt for Gemini around a generate_risk_data_section block
+def generate_risk_prompt_from_section(fc_name, city, data_section):
     prompt = f"""
     You are an AI expert in supply chain risk management for Amazon Fulfillment Centers (FCs). Your task is to:
     1. Assess the risk of disruption for the {fc_name} located in {city} based on the provided data.
@@ -710,83 +973,190 @@ def generate_risk_prompt(fc_name, city, fc_id, event_type, simulated_weather, si
     - Show your reasoning and emergency category classifications.
     - If using simulation data, treat it as real data and proceed normally.
 
-    ### Data for {fc_name} ({city})
-    #### Weather Data (Last 24 Hours)
+"""
+    return prompt + data_section + risk_prompt_instructions()
+
+# One instruction block for several FCs; sections are (fc_name, city, data_section)
+def generate_batch_risk_prompt(sections):
+    fc_list = "; ".join(f"{fc_name} ({city})" for fc_name, city, _ in sections)
+    prompt = f"""
+    You are an AI expert in supply chain risk management for Amazon Fulfillment Centers (FCs). For EACH of these FCs: {fc_list}, your task is to:
+    1. Assess the risk of disruption for the FC based on its own data below.
+    2. Determine if products in the FC's inventory belong to emergency categories critical for public health and safety.
+    3. Provide a risk score (0-100) and classify the risk status strictly as one of: "Low Risk", "Medium Risk", or "High Risk".
+
+    **COMPULSORY**: 
+    - Do NOT use asterisks (**) or any markdown formatting in the status field.
+    - Do NOT use "Unknown" or any status other than "Low Risk", "Medium Risk", or "High Risk".
+    - Every FC must have a risk status assigned.
+    - Show your reasoning and emergency category classifications.
+    - If using simulation data, treat it as real data and proceed normally.
+
+"""
+    for _, _, data_section in sections:
+        prompt += data_section
+    if GEMINI_OUTPUT_FORMAT == "json":
+        return prompt + RISK_PROMPT_INSTRUCTIONS_JSON + """
+    4. **Multiple FCs**:
+        - Respond with JSON only: {"fcs": [...]} holding one object per FC listed above, each with "fc_name" (exactly as given) plus the fields in the Output Format.
+        - Classify only the SKUs in that FC's own inventory.
     """
+    return prompt + RISK_PROMPT_INSTRUCTIONS + f"""
+    4. **Multiple FCs**:
+        - Answer every FC listed above, each in its own block in the Output Format.
+        - Start each block with a line "{BATCH_MARKER.format('[FC name exactly as given]')}" and nothing else on that line.
+        - Classify only the SKUs in that FC's own inventory.
+    """
+
+# Inventory as one total line per category (emergency categories first) plus
+# one line per emergency-defined SKU, lowest stock first, for the model to
+# classify; the SKU lines are the part the prompt budget may cut
+def summarize_inventory(inventory_data):
+    categories = {}
+    for doc in inventory_data:
+        totals = categories.setdefault(doc.get('L1_Category', 'N/A'), {"skus": 0, "units": 0, "emergency_skus": 0, "emergency_units": 0})
+        quantity = doc.get('Quantity', 0) or 0
+        totals["skus"] += 1
+        totals["units"] += quantity
+        if doc.get('Is_Emergency_Defined'):
+            totals["emergency_skus"] += 1
+            totals["emergency_units"] += quantity
+    summary_lines = [
+        f"- {category}: {totals['skus']} SKUs, {totals['units']:g} units, {totals['emergency_skus']} emergency SKUs ({totals['emergency_units']:g} units)"
+        for category, totals in sorted(categories.items(), key=lambda item: (-item[1]["emergency_skus"], item[0]))
+    ]
+    emergency_docs = sorted((doc for doc in inventory_data if doc.get('Is_Emergency_Defined')), key=lambda doc: doc.get('Quantity', 0) or 0)
+    sku_lines = [
+        (doc.get('Product_SKU'), f"- SKU: {doc.get('Product_SKU', 'N/A')}, Category: {doc.get('L1_Category', 'N/A')}, Description: {doc.get('Product_Description', 'N/A')}, Quantity: {doc.get('Quantity', 'N/A')}")
+        for doc in emergency_docs
+    ]
+    return summary_lines, sku_lines
+
+# Per-FC data block (weather, forecast, social, news, labor, logistics,
+# inventory) fitted to token_budget (GEMINI_PROMPT_TOKEN_BUDGET by default).
+# Returns (text, {section name: estimated tokens}).
+def generate_risk_data_section(fc_name, city, fc_id, event_type, simulated_weather, simulated_social_media, simulated_inventory, simulated_news, simulated_labor, simulated_logistics, token_budget=None):
+    token_budget = GEMINI_PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+    time_threshold = time.time() - 86400
+    sections = []
+  
     weather_data = simulated_weather if event_type == "weather" and simulated_weather is not None else list(
         weather_collection.find({"location": city, "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
     )
-    if not weather_data:
-        prompt += "No recent weather data available.\n"
-    else:
-        for doc in weather_data:
-            prompt += f"- {doc.get('est_datetime', 'N/A')}: Weather {doc.get('weather', 'N/A')}, Temp {doc.get('temp', 'N/A')}°C, Conditions: {doc.get('description', 'N/A')}\n"
+    sections.append(PromptSection(
+        "weather",
+        f"""    ### Data for {fc_name} ({city})
+    #### Weather Data (Last 24 Hours)
+    """,
+        [
+            ((doc.get('weather'), doc.get('temp'), doc.get('description')),
+             f"- {doc.get('est_datetime', 'N/A')}: Weather {doc.get('weather', 'N/A')}, Temp {doc.get('temp', 'N/A')}°C, Conditions: {doc.get('description', 'N/A')}")
+            for doc in weather_data
+        ],
+        "No recent weather data available."
+    ))
+
+    if not (event_type == "weather" and simulated_weather is not None):
+        forecast_doc = weather_forecast_collection.find_one({"location": city}, {"peak_risk": 1, "peak_risk_time": 1})
+        forecast_lines = []
+        if forecast_doc and forecast_doc.get("peak_risk"):
+            for hours, peak in sorted(forecast_doc["peak_risk"].items(), key=lambda item: int(item[0])):
+                peak_time = forecast_doc.get("peak_risk_time", {}).get(hours)
+                peak_at = datetime.fromtimestamp(peak_time, pytz.timezone("America/New_York")).strftime("%Y-%m-%d %H:%M") if peak_time else "N/A"
+                forecast_lines.append(f"- Peak risk next {hours}h: {peak} (at {peak_at} EST)")
+        sections.append(PromptSection(
+            "weather_forecast",
+            """
+    #### Weather Forecast Risk (Precomputed, 0-1 scale)
+    """,
+            [],
+            "No weather forecast available.",
+            fixed_lines=forecast_lines
+        ))
           
-    prompt += """
-    #### Social Media (Reddit, Last 24 Hours)
-    """
     social_data = simulated_social_media if event_type in ["weather", "labor"] and simulated_social_media is not None else list(
         social_media_collection.find({"location": city, "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
     )
-    if not social_data:
-        prompt += "No recent social media data available.\n"
-    else:
-        for doc in social_data:
-            post_text = doc.get('text', 'N/A')
-            subreddit = doc.get('subreddit', 'N/A')
-            created_utc = doc.get('created_utc', 'N/A')
-            sentiment = doc.get('sentiment', 'Neutral')
-            prompt += f"- r/{subreddit} ({created_utc}): \"{post_text}\" (Sentiment: {sentiment})\n"
+    sections.append(PromptSection(
+        "social_media",
+        """
+    #### Social Media (Reddit, Last 24 Hours)
+    """,
+        [
+            ((doc.get('subreddit'), doc.get('text')),
+             f"- r/{doc.get('subreddit', 'N/A')} ({doc.get('created_utc', 'N/A')}): \"{doc.get('text', 'N/A')}\" (Sentiment: {doc.get('sentiment', 'Neutral')})")
+            for doc in social_data
+        ],
+        "No recent social media data available."
+    ))
           
-    prompt += """
-    #### News (Last 24 Hours)
-    """
     news_data = simulated_news if event_type in ["other", "labor"] and simulated_news is not None else list(
-        news_collection.find({"location": city, "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
+        news_collection.find({"$or": [{"location": city}, {"locations": city}], "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
     )
-    if not news_data:
-        prompt += "No recent news data available.\n"
-    else:
-        for doc in news_data:
-            prompt += f"- Reuters ({doc.get('timestamp', 'N/A')}): \"{doc.get('description', 'N/A')}\" (Impact: {doc.get('impact', 'Unknown')})\n"
+    sections.append(PromptSection(
+        "news",
+        """
+    #### News (Last 24 Hours)
+    """,
+        [
+            ((doc.get('description'), doc.get('impact')),
+             f"- {', '.join(doc.get('sources', ['Reuters']))} ({doc.get('timestamp', 'N/A')}): \"{doc.get('description', 'N/A')}\" (Impact: {doc.get('impact', 'Unknown')})")
+            for doc in news_data
+        ],
+        "No recent news data available."
+    ))
           
-    prompt += """
-    #### Labor (Last 24 Hours)
-    """
     labor_data = simulated_labor if event_type == "labor" and simulated_labor is not None else list(
-        labor_collection.find({"location": city, "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
+        labor_collection.find({"$or": [{"location": city}, {"locations": city}], "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
     )
-    if not labor_data:
-        prompt += "No recent labor data available.\n"
-    else:
-        for doc in labor_data:
-            prompt += f"- Reuters ({doc.get('timestamp', 'N/A')}): \"{doc.get('description', 'N/A')}\" (Severity: {doc.get('severity', 'Unknown')})\n"
+    sections.append(PromptSection(
+        "labor",
+        """
+    #### Labor (Last 24 Hours)
+    """,
+        [
+            ((doc.get('description'), doc.get('severity')),
+             f"- {', '.join(doc.get('sources', ['Reuters']))} ({doc.get('timestamp', 'N/A')}): \"{doc.get('description', 'N/A')}\" (Severity: {doc.get('severity', 'Unknown')})")
+            for doc in labor_data
+        ],
+        "No recent labor data available."
+    ))
           
-    prompt += """
-    #### Logistics (Last 24 Hours)
-    """
     logistics_data = simulated_logistics if event_type == "logistics" and simulated_logistics is not None else list(
-        logistics_collection.find({"location": city, "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
+        logistics_collection.find({"$or": [{"location": city}, {"locations": city}], "timestamp": {"$gte": time_threshold}}).sort("timestamp", -1)
     )
-    if not logistics_data:
-        prompt += "No recent logistics data available.\n"
-    else:
-        for doc in logistics_data:
-            prompt += f"- FreightWaves ({doc.get('est_datetime', 'N/A')}): \"{doc.get('description', 'N/A')}\" (Disruption Level: {doc.get('disruption_level', 'Unknown')})\n"
+    sections.append(PromptSection(
+        "logistics",
+        """
+    #### Logistics (Last 24 Hours)
+    """,
+        [
+            ((doc.get('description'), doc.get('disruption_level')),
+             f"- {', '.join(doc.get('sources', ['FreightWaves']))} ({doc.get('est_datetime', 'N/A')}): \"{doc.get('description', 'N/A')}\" (Disruption Level: {doc.get('disruption_level', 'Unknown')})")
+            for doc in logistics_data
+        ],
+        "No recent logistics data available."
+    ))
           
-    prompt += """
-    #### Inventory (All Products)
-    """
     inventory_data = simulated_inventory if event_type == "inventory" and simulated_inventory is not None else list(
-        inventory_collection.find({"FC_ID": fc_id})
+        inventory_collection.find({"FC_ID": fc_id}, {"Product_SKU": 1, "L1_Category": 1, "Product_Description": 1, "Quantity": 1, "Is_Emergency_Defined": 1})
     )
-    if not inventory_data:
-        prompt += "No inventory data available.\n"
-    else:
-        for doc in inventory_data:
-            prompt += f"- SKU: {doc.get('Product_SKU', 'N/A')}, Category: {doc.get('L1_Category', 'N/A')}, Description: {doc.get('Product_Description', 'N/A')}, Quantity: {doc.get('Quantity', 'N/A')}\n"
-          
-    prompt += """
+    summary_lines, sku_lines = summarize_inventory(inventory_data)
+    sections.append(PromptSection(
+        "inventory",
+        """
+    #### Inventory (Totals by Category; Emergency-Defined SKUs Listed for Classification)
+    """,
+        sku_lines,
+        "No inventory data available.",
+        fixed_lines=summary_lines
+    ))
+
+    data_section, section_tokens = fit_sections(sections, token_budget)
+    logger.debug(f"Prompt data section for {fc_name}: {section_tokens}")
+    return data_section, section_tokens
+
+RISK_PROMPT_INSTRUCTIONS = """
     ### Instructions
     1. **Risk Assessment**:
         - Analyze the data to predict the risk of disruption (0-100).
@@ -815,129 +1185,24 @@ def generate_risk_prompt(fc_name, city, fc_id, event_type, simulated_weather, si
         - SKU: ABC123, Emergency: True, Reason: Health-related product critical during disruptions.
         - SKU: XYZ789, Emergency: False, Reason: Non-critical electronics item.
     """
-    return prompt
-
-# Updated Contingency Plan Logic
-def generate_contingency_plan(fc_name, city, risk_score, risk_data, fc_coordinates, current_emergency_classifications, shipments_collection, fulfillment_centers_collection):
-    full_contingency_plan = []
-    emergency_skus = [c["SKU"] for c in current_emergency_classifications if c["Emergency"]]
-    summary_status = "No re-routing needed"
-    should_evaluate_rerouting = False
-    gemini_status = risk_data.get(fc_name, {}).get("Status", "Low Risk")  # Default to Low Risk if missing
-  
-    if gemini_status == "High Risk":
-        should_evaluate_rerouting = True
-        full_contingency_plan.append({"Type": "Info", "Message": "Gemini assessed status as High Risk. Immediate re-routing evaluation triggered."})
-    elif gemini_status == "Medium Risk":
-        should_evaluate_rerouting = True
-        full_contingency_plan.append({"Type": "Info", "Message": "Gemini assessed status as Medium Risk. Re-routing evaluation for potential disruptions triggered."})
-    elif emergency_skus and any(word in risk_data.get(fc_name, {}).get("Reasoning", "")for word in ["disruption", "delay", "impact", "traffic", "issue", "risk"]):
-        should_evaluate_rerouting = True
-        full_contingency_plan.append({"Type": "Info", "Message": "Emergency SKUs detected and disruption/risk mentioned in reasoning. Re-routing evaluation triggered."})
-      
-    if not should_evaluate_rerouting:
-        full_contingency_plan.append({"Type": "Info", "Message": "No re-routing needed based on risk assessment."})
-        return summary_status, full_contingency_plan, []
-  
-    if not emergency_skus:
-        full_contingency_plan.append({"Type": "Info", "Message": "No emergency SKUs identified for re-routing consideration."})
-        return "Re-routing evaluation needed (No Emergency SKUs)", full_contingency_plan, []
-  
-    shipments_found_for_emergency_skus = False
-    re_routing_options_found = False
-    emergency_sku_reroute_status = []
-  
-    for sku in emergency_skus:
-        shipments = list(shipments_collection.find({"Product_SKU": sku, "Status": {"$in": ["Pending", "In Transit", "Out for Delivery"]}}))
-      
-        if not shipments:
-            full_contingency_plan.append({"Type": "No Shipment", "SKU": sku, "Status": f"No active shipments found for emergency SKU {sku}."})
-            emergency_sku_reroute_status.append({"SKU": sku, "Status": "No Active Shipment"})
-            continue
-        else:
-            shipments_found_for_emergency_skus = True
-          
-        for shipment in shipments:
-            shipment_id = shipment.get("Shipment_ID", "N/A")
-            required_qty = shipment.get("Order_Volume", 0)
-            dest_lat = shipment.get("Destination_Lat")
-            dest_lon = shipment.get("Destination_Lon")
-            original_cost = shipment.get("initial_shipping_cost", 0)
-            original_tat_days = shipment.get("initial_delivery_tat_days", 0)
-          
-            if dest_lat is None or dest_lon is None:
-                full_contingency_plan.append({"Type": "Shipment", "Shipment ID": shipment_id, "SKU": sku, "Status": "Missing destination coordinates."})
-                emergency_sku_reroute_status.append({"SKU": sku, "Status": "No Optimal Route"})
-                continue
-          
-            nearest_fcs_ids = get_nearest_fcs(dest_lat, dest_lon, fc_coordinates)
-            found_alternative_for_this_shipment = False
-            for nearby_fc_id in nearest_fcs_ids:
-                nearby_fc_name = fc_id_to_name.get(nearby_fc_id, nearby_fc_id)
-                nearby_fc_details_doc = fulfillment_centers_collection.find_one({"FC_ID": nearby_fc_id}) 
-              
-                if not nearby_fc_details_doc:
-                    logger.warning(f"FC details not found in DB for nearby_fc_id: {nearby_fc_id}")
-                    continue
-              
-                cost_multiplier = nearby_fc_details_doc.get("re_routing_cost_multiplier", 1.2)
-                tat_adder = nearby_fc_details_doc.get("re_routing_tat_adder_days", 1)
-                availability = check_inventory(nearby_fc_id, sku, required_qty)
-                if availability >= 90:
-                    re_routed_cost = original_cost * cost_multiplier
-                    re_routed_tat_days = original_tat_days + tat_adder
-                    cost_increase = re_routed_cost - original_cost
-                    tat_delay_days = re_routed_tat_days - original_tat_days
-                  
-                    full_contingency_plan.append({
-                        "Type": "Shipment",
-                        "Shipment ID": shipment_id,
-                        "SKU": sku,
-                        "Re-routing Destination": nearby_fc_name,
-                        "Inventory %": round(availability, 1),
-                        "Original Cost": round(original_cost, 2),
-                        "New Cost": round(re_routed_cost, 2),
-                        "Cost Δ": round(cost_increase, 2),
-                        "Original TAT": original_tat_days,
-                        "New TAT": re_routed_tat_days,
-                        "TAT Δ": tat_delay_days
-                    })
-                    re_routing_options_found = True
-                    found_alternative_for_this_shipment = True
-                    emergency_sku_reroute_status.append({"SKU": sku, "Status": "Re-routed"})
-                    break
-              
-            if not found_alternative_for_this_shipment:
-                full_contingency_plan.append({"Type": "Shipment", "Shipment ID": shipment_id, "SKU": sku, "Status": "No nearby FC with sufficient inventory within 150 miles to re-route."})
-                emergency_sku_reroute_status.append({"SKU": sku, "Status": "No Optimal Route"})
-              
-    if re_routing_options_found:
-        summary_status = "Re-routing options available"
-    elif shipments_found_for_emergency_skus:
-        summary_status = "Re-routing evaluation: No optimal routes found"
-    else:
-        summary_status = "No active emergency shipments found"
-      
-    return summary_status, full_contingency_plan, emergency_sku_reroute_status
-
-# Check Inventory Availability
-def check_inventory(fc_id, sku, required_qty):
-    inventory_doc = inventory_collection.find_one({"FC_ID": fc_id, "Product_SKU": sku})
-    if inventory_doc and "Quantity" in inventory_doc:
-        available_qty = inventory_doc["Quantity"]
-        return (available_qty / required_qty) * 100 if required_qty > 0 else 0.0
-    return 0.0
-
-# Function to get nearest FCs based on distance
-def get_nearest_fcs(destination_lat, destination_lon, fc_coordinates):
-    nearest_fcs = []
-    for fc_id, fc_details in fc_coordinates.items():
-        fc_lat, fc_lon = fc_details["coords"]
-        distance = geodesic((destination_lat, destination_lon), (fc_lat, fc_lon)).miles
-        if distance <= 150:
-            nearest_fcs.append((fc_id, distance))
-    nearest_fcs.sort(key=lambda x: x[1])
-    return [fc[0] for fc in nearest_fcs]
+
+# Structured-output instructions: the response schema fixes the shape, so no
+# example block is needed
+RISK_PROMPT_INSTRUCTIONS_JSON = """
+    ### Instructions
+    1. **Risk Assessment**:
+        - Analyze the data to predict the risk of disruption (0-100) and explain your reasoning concisely.
+        - Classify the risk status as exactly one of: "Low Risk", "Medium Risk", or "High Risk" (default to "Low Risk" if no risk factors are present).
+
+    2. **Emergency Category Classification**:
+        - For each product, determine if it’s an emergency item based on category and description (e.g., health, safety items).
+
+    3. **Output Format**:
+        - Respond with JSON only: {"risk_score": number, "status": "Low Risk" | "Medium Risk" | "High Risk", "reasoning": string, "emergency_classifications": [{"sku": string, "emergency": true | false, "reason": string}]}
+    """
+
+def risk_prompt_instructions():
+    return RISK_PROMPT_INSTRUCTIONS_JSON if GEMINI_OUTPUT_FORMAT == "json" else RISK_PROMPT_INSTRUCTIONS
 
 # Helper function to get aggregated disruption data
 def get_disruption_history_data():
@@ -970,104 +1235,213 @@ def get_disruption_history_data():
     
     return daily_disruptions, df_disruptions
 
-# Cached FC Data Function
-def get_fc_data(mode, selected_scenario):
+# FC names affected by a set of change keys. A changed shipment SKU affects
+# every FC stocking it, since contingency plans look up shipments by SKU.
+def get_dirty_fcs(changed_keys, fc_to_city, fc_to_fc_id):
+    cities = {value for kind, value in changed_keys if kind == "city"}
+    fc_ids = {value for kind, value in changed_keys if kind == "fc"}
+    skus = [value for kind, value in changed_keys if kind == "sku"]
+    if skus:
+        fc_ids.update(inventory_collection.distinct("FC_ID", {"Product_SKU": {"$in": skus}}))
+    return [fc for fc, city in fc_to_city.items() if city in cities or fc_to_fc_id[fc] in fc_ids]
+
+def get_error_row(fc, city, message):
+  return {
+    "FC Name": fc,
+    "City": city,
+    "Risk Score": 50,
+    "Status": "Unknown",
+    "Contingency Plan": "Error processing data",
+    "Last Updated (EST)": get_est_datetime(),
+    "Reasoning": f"Error: {message}",
+    "View Plan": "N/A"
+  }
+
+# Single-FC prompt, its data section (the part a batched prompt reuses) and
+# the data section's per-section token estimates
+def build_fc_prompt(fc, city, fc_id, mode, scenario, event_type):
+  # Determine simulated data based on event_type only
+  simulated_weather = get_simulated_weather(scenario, city) if mode == "Simulation Mode" and scenario else None
+  simulated_social_media = get_simulated_social_media(scenario, city) if mode == "Simulation Mode" and scenario else None
+  simulated_inventory = get_simulated_inventory(scenario, fc, fc_id) if mode == "Simulation Mode" and scenario else None
+  simulated_labor = get_simulated_labor(scenario, city) if mode == "Simulation Mode" and scenario else None
+  simulated_news = get_simulated_news(scenario, city) if mode == "Simulation Mode" and scenario else None
+  simulated_logistics = get_simulated_logistics(scenario, city) if mode == "Simulation Mode" and scenario else None
+  
+  data_section, section_tokens = generate_risk_data_section(
+    fc_name=fc,
+    city=city,
+    fc_id=fc_id,
+    event_type=event_type,
+    simulated_weather=simulated_weather,
+    simulated_social_media=simulated_social_media,
+    simulated_inventory=simulated_inventory,
+    simulated_news=simulated_news,
+    simulated_labor=simulated_labor,
+    simulated_logistics=simulated_logistics
+  )
+  return generate_risk_prompt_from_section(fc, city, data_section), data_section, section_tokens
+
+# Contingency plan, gemini_prompts insert and dashboard row for one prediction
+def finish_fc(fc, city, fc_id, risk_prompt, section_tokens, prediction, cache_info, fc_coordinates, fc_id_to_name):
+  risk_score, status, reasoning, emergency_classifications_from_gemini = prediction
+  
+  # The contingency plan only reads this FC's entry
+  risk_data = {fc: {"Risk Score": risk_score, "Status": status, "Reasoning": reasoning}}
+  
+  # Generate contingency plan with updated risk_data
+  contingency_plan_summary, contingency_plan_full_detail, emergency_sku_reroute_status = generate_contingency_plan(
+    fc, city, risk_score, risk_data, fc_coordinates,
+    emergency_classifications_from_gemini,
+    shipments_collection, fulfillment_centers_collection, inventory_collection, fc_id_to_name
+  )
+  
+  # Store results in the database
+  gemini_prompts_collection.insert_one({
+    "fc_name": fc,
+    "city": city,
+    "prompt_text": risk_prompt,
+    "timestamp": get_est_datetime(),
+    "emergency_classifications": emergency_classifications_from_gemini,
+    "reasoning": reasoning,
+    "contingency_plan_full": contingency_plan_full_detail,
+    "emergency_sku_reroute_status": emergency_sku_reroute_status,
+    "risk_score": risk_score,
+    "status": status,
+    "prompt_tokens": estimate_tokens(risk_prompt),
+    "prompt_section_tokens": section_tokens,
+    # prompt_hash/model_name/created_at; absent when the prediction failed, so errors are never served from cache
+    **cache_info
+  })
+  
+  return {
+    "FC Name": f'<a href="?selected_fc={fc_id}&view=inventory">{fc}</a>',
+    "City": city,
+    "Risk Score": risk_score,
+    "Status": status,
+    "Contingency Plan": contingency_plan_summary,
+    "Last Updated (EST)": get_est_datetime(),
+    "Reasoning": f'<a href="?selected_fc={fc_id}&view=reasoning">View Reasoning</a>',
+    "View Plan": f'<a href="?selected_fc={fc_id}&view=contingency_plan">View Plan</a>'
+  }
+
+# Prompt, Gemini prediction, contingency plan and gemini_prompts insert for one
+# FC; runs on a worker thread, so it must not call st.*
+def process_fc(fc, city, fc_id, mode, scenario, event_type, fc_coordinates, fc_id_to_name):
+  try:
+    risk_prompt, _, section_tokens = build_fc_prompt(fc, city, fc_id, mode, scenario, event_type)
+    # Get risk assessment from Gemini (or the response cache)
+    cache_info = {}
+    prediction = gemini_predict(risk_prompt, fc_name=fc, cache_info=cache_info)
+    return [(fc, finish_fc(fc, city, fc_id, risk_prompt, section_tokens, prediction, cache_info, fc_coordinates, fc_id_to_name))]
+  except Exception as e:
+    logger.error(f"Error processing FC {fc}: {str(e)}")
+    return [(fc, get_error_row(fc, city, str(e)))]
+
+# process_fc for a group of FCs sharing Gemini requests: the group is split
+# into requests whose data sections fit GEMINI_BATCH_TOKEN_BUDGET
+def process_fc_batch(batch_fcs, fc_to_city, fc_to_fc_id, mode, scenario, event_type, fc_coordinates, fc_id_to_name):
+  rows = []
+  entries = []
+  section_tokens = {}
+  for fc in batch_fcs:
+    try:
+      risk_prompt, data_section, section_tokens[fc] = build_fc_prompt(fc, fc_to_city[fc], fc_to_fc_id[fc], mode, scenario, event_type)
+      entries.append((fc, fc_to_city[fc], risk_prompt, data_section))
+    except Exception as e:
+      logger.error(f"Error processing FC {fc}: {str(e)}")
+      rows.append((fc, get_error_row(fc, fc_to_city[fc], str(e))))
+  
+  requests_entries = []
+  for entry in entries:
+    tokens = estimate_tokens(entry[3])
+    if requests_entries and requests_entries[-1][1] + tokens <= GEMINI_BATCH_TOKEN_BUDGET:
+      requests_entries[-1][0].append(entry)
+      requests_entries[-1][1] += tokens
+    else:
+      requests_entries.append([[entry], tokens])
+  
+  for request_entries, _ in requests_entries:
+    try:
+      predictions = gemini_predict_batch(request_entries)
+    except Exception as e:
+      logger.error(f"Error processing FC batch {[fc for fc, _, _, _ in request_entries]}: {str(e)}")
+      predictions = {fc: ((50, "Low Risk", f"Gemini prediction error: {str(e)}", []), {}) for fc, _, _, _ in request_entries}
+    for fc, city, risk_prompt, _ in request_entries:
+      try:
+        prediction, cache_info = predictions[fc]
+        rows.append((fc, finish_fc(fc, city, fc_to_fc_id[fc], risk_prompt, section_tokens[fc], prediction, cache_info, fc_coordinates, fc_id_to_name)))
+      except Exception as e:
+        logger.error(f"Error processing FC {fc}: {str(e)}")
+        rows.append((fc, get_error_row(fc, city, str(e))))
+  return rows
+
+# FC Data Function: yields (fc_name, row) for every FC, or only fc_names, in
+# completion order. Work runs concurrently (FC_MAX_CONCURRENCY tasks); with
+# GEMINI_BATCH_SIZE > 1 each task is a group of up to that many neighbouring
+# FCs (ordered west to east) scored through shared Gemini requests. A task
+# still running after FC_TASK_TIMEOUT_SECONDS yields error rows for its FCs
+# and its result is discarded.
+def get_fc_data(mode, selected_scenario, fc_names=None):
   fcs, fc_to_city, fc_to_fc_id, fc_id_to_name, fc_coordinates = get_fcs()
   if not fcs:
     logger.info("No FCs to process, yielding empty list.")
     return
   
-  risk_data = {}
   if mode == "Simulation Mode" and selected_scenario:
     scenario = scenarios[selected_scenario]
     affected_cities = scenario.get("affected_cities", [])
-    affected_fcs = scenario.get("affected_fcs", [])
     event_type = scenario["event_type"]
     logger.info(f"Simulation Mode: Scenario={selected_scenario}, Event Type={event_type}, Affected Cities={affected_cities}")
   else:
     scenario = None
     event_type = None
-    affected_cities = []
-    affected_fcs = []
     logger.info("Real Mode: No simulation scenario applied.")
-    
-  current_time = time.time()
-  time_threshold = current_time - 86400
   
-  for fc in fcs:
-    city = fc_to_city[fc]
-    fc_id = fc_to_fc_id[fc]
-    
-    # Determine simulated data based on event_type only
-    simulated_weather = get_simulated_weather(scenario, city) if mode == "Simulation Mode" and scenario else None
-    simulated_social_media = get_simulated_social_media(scenario, city) if mode == "Simulation Mode" and scenario else None
-    simulated_inventory = get_simulated_inventory(scenario, fc, fc_id) if mode == "Simulation Mode" and scenario else None
-    simulated_labor = get_simulated_labor(scenario, city) if mode == "Simulation Mode" and scenario else None
-    simulated_news = get_simulated_news(scenario, city) if mode == "Simulation Mode" and scenario else None
-    simulated_logistics = get_simulated_logistics(scenario, city) if mode == "Simulation Mode" and scenario else None
-    
-    try:
-      risk_prompt = generate_risk_prompt(
-        fc_name=fc,
-        city=city,
-        fc_id=fc_id,
-        event_type=event_type,
-        simulated_weather=simulated_weather,
-        simulated_social_media=simulated_social_media,
-        simulated_inventory=simulated_inventory,
-        simulated_news=simulated_news,
-        simulated_labor=simulated_labor,
-        simulated_logistics=simulated_logistics
-      )
-      # Get risk assessment from Gemini
-      risk_score, status, reasoning, emergency_classifications_from_gemini = gemini_predict(risk_prompt, fc_name=fc)
-      
-      # Update risk_data BEFORE generating the contingency plan
-      risk_data[fc] = {"Risk Score": risk_score, "Status": status, "Reasoning": reasoning}
-      
-      # Generate contingency plan with updated risk_data
-      contingency_plan_summary, contingency_plan_full_detail, emergency_sku_reroute_status = generate_contingency_plan(
-        fc, city, risk_score, risk_data, fc_coordinates,
-        emergency_classifications_from_gemini,
-        shipments_collection, fulfillment_centers_collection
-      )
-      
-      # Store results in the database
-      gemini_prompts_collection.insert_one({
-        "fc_name": fc,
-        "city": city,
-        "prompt_text": risk_prompt,
-        "timestamp": get_est_datetime(),
-        "emergency_classifications": emergency_classifications_from_gemini,
-        "reasoning": reasoning,
-        "contingency_plan_full": contingency_plan_full_detail,
-        "emergency_sku_reroute_status": emergency_sku_reroute_status
-      })
-      
-      row = {
-        "FC Name": f'<a href="?selected_fc={fc_id}&view=inventory">{fc}</a>',
-        "City": city,
-        "Risk Score": risk_score,
-        "Status": status,
-        "Contingency Plan": contingency_plan_summary,
-        "Last Updated (EST)": get_est_datetime(),
-        "Reasoning": f'<a href="?selected_fc={fc_id}&view=reasoning">View Reasoning</a>',
-        "View Plan": f'<a href="?selected_fc={fc_id}&view=contingency_plan">View Plan</a>'
-      }
-      yield row
-    except Exception as e:
-      logger.error(f"Error processing FC {fc}: {str(e)}")
-      row = {
-        "FC Name": fc,
-        "City": city,
-        "Risk Score": 50,
-        "Status": "Unknown",
-        "Contingency Plan": "Error processing data",
-        "Last Updated (EST)": get_est_datetime(),
-        "Reasoning": f"Error: {str(e)}",
-        "View Plan": "N/A"
-      }
-      yield row
+  selected_fcs = [fc for fc in fcs if fc_names is None or fc in fc_names]
+  if not selected_fcs:
+    return
+  
+  if GEMINI_BATCH_SIZE > 1:
+    # Neighbouring FCs (by longitude, then city) share a batch
+    selected_fcs.sort(key=lambda fc: (fc_coordinates.get(fc_to_fc_id[fc], {}).get("coords", (0, 0))[1], fc_to_city[fc]))
+    tasks = [selected_fcs[i:i + GEMINI_BATCH_SIZE] for i in range(0, len(selected_fcs), GEMINI_BATCH_SIZE)]
+  else:
+    tasks = [[fc] for fc in selected_fcs]
+  
+  started_at = time.time()
+  started = {}
+  def run(task_index):
+    started[task_index] = time.time()
+    task_fcs = tasks[task_index]
+    if len(task_fcs) > 1:
+      return process_fc_batch(task_fcs, fc_to_city, fc_to_fc_id, mode, scenario, event_type, fc_coordinates, fc_id_to_name)
+    fc = task_fcs[0]
+    return process_fc(fc, fc_to_city[fc], fc_to_fc_id[fc], mode, scenario, event_type, fc_coordinates, fc_id_to_name)
+  
+  executor = ThreadPoolExecutor(max_workers=max(1, min(FC_MAX_CONCURRENCY, len(tasks))), thread_name_prefix="fc-score")
+  try:
+    pending = {executor.submit(run, task_index): task_index for task_index in range(len(tasks))}
+    while pending:
+      # Wake at the earliest deadline among started tasks (unstarted ones are still queued)
+      now = time.time()
+      deadlines = [started[task_index] + FC_TASK_TIMEOUT_SECONDS for task_index in pending.values() if task_index in started]
+      timeout = max(0, min(deadlines) - now) if deadlines else FC_TASK_TIMEOUT_SECONDS
+      done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+      for future in done:
+        pending.pop(future)
+        yield from future.result()
+      now = time.time()
+      for future, task_index in list(pending.items()):
+        if task_index in started and now - started[task_index] >= FC_TASK_TIMEOUT_SECONDS:
+          del pending[future]
+          for fc in tasks[task_index]:
+            logger.error(f"Timed out processing FC {fc} after {FC_TASK_TIMEOUT_SECONDS:g}s")
+            yield fc, get_error_row(fc, fc_to_city[fc], f"Timed out after {FC_TASK_TIMEOUT_SECONDS:g}s")
+  finally:
+    # Don't block the page on timed-out workers; queued FCs are dropped
+    executor.shutdown(wait=False, cancel_futures=True)
+    logger.info(f"Processed {len(selected_fcs)} FCs in {len(tasks)} tasks in {time.time() - started_at:.1f}s (concurrency {FC_MAX_CONCURRENCY})")
       
       
 # Streamlit Dashboard
@@ -1106,7 +1480,10 @@ try:
             st.session_state.last_refresh = time.time()
             st.rerun()
     
-    st.info("Real-time FC risk statuses and contingency plans. In Real Mode, data refreshes every 5 minutes automatically.")
+    if change_watcher.available:
+        st.info("Real-time FC risk statuses and contingency plans. In Real Mode, data refreshes every 5 minutes automatically, recomputing only FCs whose inputs changed.")
+    else:
+        st.info("Real-time FC risk statuses and contingency plans. In Real Mode, data refreshes every 5 minutes automatically.")
     
     if st.button("Refresh Data Now"):
         logger.info("Manual refresh triggered")
@@ -1218,20 +1595,41 @@ try:
             st.query_params["view"] = "dashboard"
             st.rerun()
     else:
-        cache_key = f"{st.session_state.mode}_{selected_scenario}_{st.session_state.last_refresh}"
+        cache_key = f"{st.session_state.mode}_{selected_scenario}"
+
+        # Rows are kept per FC across refreshes. A refresh in Real Mode recomputes
+        # only the FCs the change watcher saw change (refresh_fcs); None means all.
+        # The watcher sequence is read before computing, so changes made meanwhile
+        # are picked up by the next refresh.
+        watcher_sequence = change_watcher.sequence
+        refresh_fcs = None
+        if "fc_data_rows" in st.session_state and st.session_state.get("fc_data_cache_key") == cache_key:
+            if st.session_state.get("fc_data_refreshed_at") == st.session_state.last_refresh:
+                refresh_fcs = []
+                watcher_sequence = st.session_state.fc_data_sequence
+            elif st.session_state.mode == "Real Mode":
+                changed_keys = change_watcher.changed_since(st.session_state.fc_data_sequence)
+                if changed_keys is not None:
+                    refresh_fcs = get_dirty_fcs(changed_keys, fc_to_city, fc_to_fc_id)
+                    logger.info(f"Incremental refresh: {len(refresh_fcs)} of {len(fcs)} FCs changed")
         
         summary_analytics_placeholder = st.empty()
         risk_pie_chart_placeholder = st.empty()
         disruption_bar_chart_placeholder = st.empty()
         table_display_placeholder = st.empty()
 
-        if "fc_data_cache" not in st.session_state or st.session_state.get("fc_data_cache_key") != cache_key:
+        if refresh_fcs is None:
+            st.session_state.fc_data_rows = {}
             st.session_state.fc_data_cache = []
-            st.session_state.fc_data_cache_key = cache_key
-            
+        st.session_state.fc_data_cache_key = cache_key
+        st.session_state.fc_data_refreshed_at = st.session_state.last_refresh
+        st.session_state.fc_data_sequence = watcher_sequence
+
+        if refresh_fcs is None or refresh_fcs:
             with st.spinner("Processing Fulfillment Centers..."):
-                for row_data in get_fc_data(st.session_state.mode, selected_scenario):
-                    st.session_state.fc_data_cache.append(row_data)
+                for fc, row_data in get_fc_data(st.session_state.mode, selected_scenario, fc_names=refresh_fcs):
+                    st.session_state.fc_data_rows[fc] = row_data
+                    st.session_state.fc_data_cache = list(st.session_state.fc_data_rows.values())
                     
                     df_display = pd.DataFrame(st.session_state.fc_data_cache)
                     
@@ -0,0 +1,195 @@
+# File-based dataset snapshots. export_snapshot() writes the generated
+# fulfillment_centers, inventory and shipments collections (plus the data/*.json
+# seeds) as one Parquet or compressed NPZ file per collection; load_snapshot()
+# reads them back as SnapshotCollection objects that answer the find/find_one/
+# distinct queries contingency_planning.py makes, so planning and its
+# benchmarks run with no database or network.
+
+import glob
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMATS = ["parquet", "npz"]
+EXPORT_BATCH_SIZE = 50000
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet snapshots need pyarrow (pip install pyarrow); use the npz format otherwise") from e
+    return pyarrow, pyarrow.parquet
+
+def _clean(doc):
+    return {key: value for key, value in doc.items() if key != "_id"}
+
+# Documents from each data/*.json seed that holds a JSON list; the placeholder
+# files that only contain a comment are skipped
+def load_seed_documents(data_dir="data"):
+    seeds = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.json"))):
+        try:
+            with open(path) as f:
+                docs = json.load(f)
+        except ValueError:
+            logger.warning(f"Skipping seed {path}: not valid JSON")
+            continue
+        if isinstance(docs, list):
+            seeds[f"seed_{os.path.splitext(os.path.basename(path))[0]}"] = docs
+    return seeds
+
+def _write_parquet(path, docs):
+    pa, pq = _require_pyarrow()
+    writer = None
+    count = 0
+    batch = []
+    try:
+        for doc in docs:
+            batch.append(_clean(doc))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                table = pa.Table.from_pylist(batch, schema=writer.schema if writer else None)
+                writer = writer or pq.ParquetWriter(path, table.schema, compression="zstd")
+                writer.write_table(table)
+                count += len(batch)
+                batch = []
+        if batch or writer is None:
+            table = pa.Table.from_pylist(batch, schema=writer.schema if writer else None)
+            writer = writer or pq.ParquetWriter(path, table.schema, compression="zstd")
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+# NPZ stores one array per field: numeric and boolean columns natively,
+# anything else (strings, mixed types, missing values) as JSON text listed in
+# __json_columns__
+def _write_npz(path, docs):
+    docs = [_clean(doc) for doc in docs]
+    fields = list(dict.fromkeys(key for doc in docs for key in doc))
+    arrays, json_columns = {}, []
+    for field in fields:
+        values = [doc.get(field) for doc in docs]
+        if all(isinstance(v, bool) for v in values) or all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            arrays[field] = np.array(values)
+        else:
+            arrays[field] = np.array([json.dumps(v, default=str) for v in values])
+            json_columns.append(field)
+    arrays["__json_columns__"] = np.array(json_columns, dtype=str)
+    np.savez_compressed(path, **arrays)
+    return len(docs)
+
+# Write each name -> documents (list or cursor) to out_dir/<name>.<fmt>;
+# returns the row count per name
+def export_snapshot(out_dir, collections, fmt="parquet"):
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unknown snapshot format {fmt}; expected one of {SNAPSHOT_FORMATS}")
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {}
+    for name, docs in collections.items():
+        path = os.path.join(out_dir, f"{name}.{fmt}")
+        counts[name] = _write_parquet(path, docs) if fmt == "parquet" else _write_npz(path, docs)
+        logger.info(f"Exported {counts[name]} {name} rows to {path}")
+    return counts
+
+def _read_parquet(path):
+    _, pq = _require_pyarrow()
+    return pq.read_table(path).to_pylist()
+
+def _read_npz(path):
+    with np.load(path) as data:
+        json_columns = set(data["__json_columns__"].tolist())
+        columns = {
+            field: [json.loads(v) for v in data[field].tolist()] if field in json_columns else data[field].tolist()
+            for field in data.files if field != "__json_columns__"
+        }
+    rows = len(next(iter(columns.values()), []))
+    return [{field: values[i] for field, values in columns.items() if values[i] is not None} for i in range(rows)]
+
+# In-memory stand-in for a pymongo collection, supporting equality and $in
+# filters and field-inclusion projections. Equality lookups use a per-field
+# hash index built on first use.
+class SnapshotCollection:
+    def __init__(self, name, docs):
+        self.name = name
+        self.docs = docs
+        self.indexes = {}
+
+    def _index(self, field):
+        if field not in self.indexes:
+            index = {}
+            for doc in self.docs:
+                index.setdefault(doc.get(field), []).append(doc)
+            self.indexes[field] = index
+        return self.indexes[field]
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, condition in query.items():
+            if isinstance(condition, dict):
+                if "$in" in condition and doc.get(field) not in condition["$in"]:
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    @staticmethod
+    def _project(doc, projection):
+        if not projection:
+            return dict(doc)
+        return {field: doc[field] for field, include in projection.items() if include and field in doc}
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        equality = next((field for field, condition in query.items() if not isinstance(condition, dict)), None)
+        candidates = self._index(equality).get(query[equality], []) if equality else self.docs
+        return [self._project(doc, projection) for doc in candidates if self._matches(doc, query)]
+
+    def find_one(self, query=None, projection=None):
+        query = query or {}
+        equality = next((field for field, condition in query.items() if not isinstance(condition, dict)), None)
+        candidates = self._index(equality).get(query[equality], []) if equality else self.docs
+        for doc in candidates:
+            if self._matches(doc, query):
+                return self._project(doc, projection)
+        return None
+
+    def distinct(self, field, query=None):
+        return list(dict.fromkeys(doc.get(field) for doc in self.find(query) if doc.get(field) is not None))
+
+# Load every <name>.parquet / <name>.npz under snapshot_dir as a SnapshotCollection
+def load_snapshot(snapshot_dir):
+    collections = {}
+    for path in sorted(glob.glob(os.path.join(snapshot_dir, "*"))):
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext == ".parquet":
+            collections[name] = SnapshotCollection(name, _read_parquet(path))
+        elif ext == ".npz":
+            collections[name] = SnapshotCollection(name, _read_npz(path))
+    logger.info(f"Loaded snapshot {snapshot_dir}: {', '.join(f'{name}={len(c.docs)}' for name, c in collections.items())}")
+    return collections
+
+# Everything generate_contingency_plan and get_nearest_fcs need, built from a
+# snapshot the same way the dashboard's get_fcs builds it from MongoDB
+def load_planning_inputs(snapshot_dir):
+    collections = load_snapshot(snapshot_dir)
+    fc_docs = collections["fulfillment_centers"].docs
+    return {
+        "fulfillment_centers_collection": collections["fulfillment_centers"],
+        "inventory_collection": collections["inventory"],
+        "shipments_collection": collections["shipments"],
+        "fc_id_to_name": {doc["FC_ID"]: doc["FC_Name"] for doc in fc_docs},
+        "fc_to_city": {doc["FC_Name"]: doc["city"] for doc in fc_docs},
+        "fc_coordinates": {
+            doc["FC_ID"]: {
+                "coords": (doc["Latitude"], doc["Longitude"]),
+                "cost_multiplier": doc.get("re_routing_cost_multiplier", 1.2),
+                "tat_adder": doc.get("re_routing_tat_adder_days", 1)
+            } for doc in fc_docs
+        }
+    }
@@ -0,0 +1,65 @@
+from watermarks import WatermarkTracker
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    def find(self, query):
+        return [doc for doc in self.docs if doc["source"] == query["source"]]
+
+
+class FakeWriter:
+    writes = []
+
+    def __init__(self, collection, source):
+        pass
+
+    def add(self, filter_doc, fields):
+        FakeWriter.writes.append((filter_doc, fields))
+
+    def flush(self):
+        pass
+
+
+def ingest(tracker, items):
+    """
+    Run newest-first (published, id) items through the tracker the way
+    fetch_news and fetch_social_media do; returns the IDs kept.
+    """
+    kept = []
+    for published, item_id in items:
+        if tracker.is_new("New York", "strike", published, item_id):
+            tracker.observe("New York", "strike", published, item_id)
+            kept.append(item_id)
+    tracker.save()
+    return kept
+
+
+def test_first_fetch_keeps_every_item():
+    tracker = WatermarkTracker("news", FakeCollection(), FakeWriter)
+    assert ingest(tracker, [(100, "a"), (90, "b"), (80, "c"), (80, "c")]) == ["a", "b", "c"]
+    assert tracker.marks[("New York", "strike")] == {"watermark": 100, "boundary_ids": ["a"]}
+
+
+def test_keeps_all_items_newer_than_stored_watermark():
+    stored = [{"source": "news", "location": "New York", "query": "strike", "watermark": 100, "boundary_ids": ["a"]}]
+    tracker = WatermarkTracker("news", FakeCollection(stored), FakeWriter)
+    kept = ingest(tracker, [(120, "e"), (110, "d"), (100, "a"), (100, "z"), (90, "b")])
+    assert kept == ["e", "d", "z"]
+    assert tracker.marks[("New York", "strike")] == {"watermark": 120, "boundary_ids": ["e"]}
+
+
+def test_unchanged_watermarks_are_not_rewritten():
+    stored = [{"source": "news", "location": "New York", "query": "strike", "watermark": 100, "boundary_ids": ["a"]}]
+    tracker = WatermarkTracker("news", FakeCollection(stored), FakeWriter)
+    FakeWriter.writes = []
+    assert ingest(tracker, [(100, "a"), (90, "b")]) == []
+    assert FakeWriter.writes == []
+
+
+if __name__ == "__main__":
+    test_first_fetch_keeps_every_item()
+    test_keeps_all_items_newer_than_stored_watermark()
+    test_unchanged_watermarks_are_not_rewritten()
+    print("Watermark checks passed")
@@ -0,0 +1,77 @@
+# Incremental-ingest watermarks for data_pull.py, kept in the ingest_watermarks
+# collection. writer_factory(collection, source) must return an object with
+# add(filter, fields) and flush(), such as data_pull.BulkUpsertWriter.
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Incremental watermarks per (source, location, query): the newest published
+# time seen plus the IDs seen at exactly that time, so requests can be narrowed
+# to newer items and repeats dropped before they reach the writer. Items are
+# checked against the watermarks loaded when the fetch started (responses come
+# newest first, so advancing them mid-response would drop every older new
+# item); observe() collects the advances in pending and save() applies them.
+class WatermarkTracker:
+    def __init__(self, source, collection, writer_factory):
+        self.source = source
+        self.collection = collection
+        self.writer_factory = writer_factory
+        self.lock = threading.Lock()
+        self.marks = {}
+        self.pending = {}
+        self.seen = set()
+        try:
+            for doc in collection.find({"source": source}):
+                self.marks[(doc["location"], doc["query"])] = {"watermark": doc["watermark"], "boundary_ids": doc.get("boundary_ids", [])}
+        except Exception as e:
+            logger.warning(f"Could not load watermarks for {source}, fetching full window: {e}")
+
+    def get(self, location, query):
+        mark = self.marks.get((location, query))
+        return mark["watermark"] if mark else None
+
+    def is_new(self, location, query, published, item_id):
+        if (location, query, item_id) in self.seen:
+            return False
+        mark = self.marks.get((location, query))
+        if not mark or published is None:
+            return True
+        return published > mark["watermark"] or (published == mark["watermark"] and item_id not in mark["boundary_ids"])
+
+    @staticmethod
+    def _advance(marks, key, published, ids):
+        mark = marks.get(key)
+        if not mark or published > mark["watermark"]:
+            marks[key] = {"watermark": published, "boundary_ids": list(ids)}
+            return True
+        if published == mark["watermark"]:
+            added = [item_id for item_id in ids if item_id not in mark["boundary_ids"]]
+            mark["boundary_ids"].extend(added)
+            return bool(added)
+        return False
+
+    def observe(self, location, query, published, item_id):
+        with self.lock:
+            self.seen.add((location, query, item_id))
+            if published is not None:
+                self._advance(self.pending, (location, query), published, [item_id])
+
+    # Apply and persist the advanced watermarks; call only after the items themselves were written
+    def save(self):
+        writer = self.writer_factory(self.collection, f"{self.source}_watermarks")
+        with self.lock:
+            for (location, query), mark in self.pending.items():
+                if self._advance(self.marks, (location, query), mark["watermark"], mark["boundary_ids"]):
+                    merged = self.marks[(location, query)]
+                    writer.add(
+                        {"source": self.source, "location": location, "query": query},
+                        {"watermark": merged["watermark"], "boundary_ids": merged["boundary_ids"], "updated_at": time.time()}
+                    )
+            self.pending = {}
+        try:
+            writer.flush()
+        except Exception as e:
+            logger.warning(f"Could not save watermarks for {self.source}: {e}")